@@ -5,6 +5,7 @@ import shutil
 import tempfile
 import uuid
 import random
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -64,16 +65,28 @@ from models.question_generator import (
 from models.text_editor import (
     AnalysisState,
     AnalysisType,
+    ProcessingStep,
     TextAnalysisRequest,
     TextAnalysisResponse,
-    TextAnalysisService,
     TextRecommendationsRequest,
     TextRecommendationsResponse,
+    aclose_http_client,
     app_graph,
+    get_analysis_service,
 )
 from models.video_grader import VideoGrader
 
-app = FastAPI(title=PROJECT_NAME)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Only when the service was actually created; building it here would need API keys for nothing.
+    if get_analysis_service.cache_info().currsize:
+        get_analysis_service().save_semantic_caches()
+    await aclose_http_client()
+
+
+app = FastAPI(title=PROJECT_NAME, lifespan=lifespan)
 
 # Create directories for file uploads
 UPLOAD_DIR = 'uploads'
@@ -834,7 +847,7 @@ async def get_speech_analysis(pitch_id: str):
         raise HTTPException(status_code=404, detail='No speech content found for this pitch')
 
     try:
-        service = TextAnalysisService()
+        service = get_analysis_service()
         return await service.get_legacy_interface(pitch.content, 'ru')
 
     except Exception as e:
@@ -1142,12 +1155,14 @@ async def score_text(request: TextAnalysisRequest):
         }
         if final_text.strip() == (request.text or '').strip() and any(t in analysis_types for t in expected_transforms):
             try:
-                service = TextAnalysisService()
+                service = get_analysis_service()
                 direct = await service.process_text_combined(
                     request.text,
                     [t for t in analysis_types if t in expected_transforms],
                     request.style,
                     request.language,
+                    # The graph may have sent this very request already; a cached reply would repeat its result.
+                    use_cache=False,
                 )
                 maybe_text = direct.get('processed_text')
                 if maybe_text and maybe_text.strip():
@@ -1158,13 +1173,12 @@ async def score_text(request: TextAnalysisRequest):
                     word_count = direct.get('word_count_original', word_count)
                     final_word_count = direct.get('word_count_final', final_word_count)
                     processing_steps = processing_steps or [
-                        {
-                            'step_name': 'Direct rewrite',
-                            'input_text': request.text,
-                            'output_text': final_text,
-                            'changes_made': direct.get('changes_summary', []),
-                            'metadata': direct.get('processing_details', {}),
-                        }
+                        ProcessingStep(
+                            step_name='Direct rewrite',
+                            output_text=final_text,
+                            changes_made=direct.get('changes_summary', []),
+                            metadata=direct.get('processing_details', {}),
+                        )
                     ]
             except Exception:
                 pass
@@ -1244,7 +1258,7 @@ async def get_text_recommendations(request: TextRecommendationsRequest):
     request_id = f'rec_{int(start_time.timestamp())}_{str(uuid.uuid4())[:8]}'
 
     try:
-        service = TextAnalysisService()
+        service = get_analysis_service()
         weak_spots, recommendations = await service.analyze_weak_spots(request.text, request.language)
 
         processing_time = (datetime.now() - start_time).total_seconds()
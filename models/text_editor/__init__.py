@@ -1,4 +1,5 @@
-from .service import TextAnalysisService
+from .http_client import aclose_http_client
+from .service import TextAnalysisService, get_analysis_service
 from .types import (
     AnalysisState,
     AnalysisType,
@@ -24,4 +25,6 @@ __all__ = [
     'AnalysisState',
     'app_graph',
     'TextAnalysisService',
+    'get_analysis_service',
+    'aclose_http_client',
 ]
@@ -0,0 +1,24 @@
+from typing import Optional
+
+import httpx
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Process-wide HTTP/2 client, so TLS handshakes and connections are reused across LLM calls."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=True,
+            timeout=60.0,
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=100),
+        )
+    return _client
+
+
+async def aclose_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
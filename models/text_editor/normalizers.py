@@ -1,4 +1,5 @@
-from typing import Any, Dict, Set
+import re
+from typing import Set, Tuple
 
 ALLOWED_ISSUE_TYPES: Set[str] = {
     'clarity',
@@ -16,75 +17,89 @@ ALLOWED_ISSUE_TYPES: Set[str] = {
 
 ALLOWED_SEVERITY: Set[str] = {'low', 'medium', 'high'}
 
+# Hesitation sounds are always fillers; words that are also meaningful ("вот", "типа", "короче")
+# are only treated as fillers when followed by a comma. A comma before the filler is captured as lead,
+# so "Я, ну, думаю" loses both commas instead of leaving "Я, думаю".
+_PARASITE_RE = re.compile(
+    r'(?P<lead>,[ \t]*)?'
+    r'(?:(?<![\w-])(?:э+(?:-э+)*|м{2,}|м+(?:-м+)+)(?![\w-])(?P<sound_comma>,)?'
+    r'|(?<![\w-])(?:ну|вот|как бы|в общем|короче|типа|блин)(?P<word_comma>,))[ \t]*',
+    re.IGNORECASE,
+)
+_EXTRA_SPACES_RE = re.compile(r'[ \t]{2,}')
+# Substring markers of good practices; one case-insensitive scan each instead of lowering the text per word.
+_CALL_TO_ACTION_RE = re.compile('рекомендую|предлагаю|призываю|действие|решение', re.IGNORECASE)
+_EXAMPLES_RE = re.compile('например|пример|случай|ситуация', re.IGNORECASE)
+
+
+def remove_parasites(text: str) -> Tuple[str, int]:
+    """Strip filler words locally; returns the cleaned text and how many fillers were removed."""
+    parts = []
+    last = 0
+    removed = 0
+    capitalize = False
+    for m in _PARASITE_RE.finditer(text):
+        chunk = text[last : m.start()]
+        if chunk and capitalize:
+            chunk = chunk[0].upper() + chunk[1:]
+            capitalize = False
+        parts.append(chunk)
+        before = text[: m.start()].rstrip(' \t')
+        # Keep the sentence capitalised when its first word was the filler.
+        capitalize = capitalize or not before or before[-1] in '.!?\n'
+        if m.group('lead'):
+            next_char = text[m.end() : m.end() + 1]
+            if not (m.group('sound_comma') or m.group('word_comma')) and next_char.isalnum():
+                # "Мы, э решили": the comma belongs to the clause, only the sound goes.
+                parts.append(', ')
+            elif next_char.isalnum():
+                parts.append(' ')
+        last = m.end()
+        removed += 1
+    if not removed:
+        return text, 0
+    tail = text[last:]
+    if tail and capitalize:
+        tail = tail[0].upper() + tail[1:]
+    parts.append(tail)
+    return _EXTRA_SPACES_RE.sub(' ', ''.join(parts)).strip(), removed
+
+
+ISSUE_TITLES = {
+    'clarity': 'Неясная формулировка',
+    'redundancy': 'Избыточность текста',
+    'bureaucracy': 'Канцелярские обороты',
+    'filler': 'Слова-паразиты',
+    'passive_overuse': 'Злоупотребление пассивным залогом',
+    'logic_gap': 'Нарушение логики',
+    'tone_mismatch': 'Несоответствие тона',
+    'term_misuse': 'Сложная терминология',
+    'punctuation_error': 'Ошибки пунктуации',
+    'wordiness': 'Длинные предложения',
+    'other': 'Другие проблемы',
+}
 
-def normalize_weak_spot(raw: Dict[str, Any]) -> Dict[str, Any]:
-    spot = dict(raw)
-
-    pos = spot.get('position')
-    if isinstance(pos, str):
-        try:
-            spot['position'] = int(float(pos))
-        except ValueError:
-            spot['position'] = 0
-    elif isinstance(pos, float):
-        spot['position'] = int(pos)
-    elif not isinstance(pos, int):
-        spot['position'] = 0
-
-    length_val = spot.get('length')
-    if isinstance(length_val, str):
-        try:
-            spot['length'] = int(float(length_val))
-        except ValueError:
-            spot['length'] = None
-    elif isinstance(length_val, float):
-        spot['length'] = int(length_val)
-    elif not isinstance(length_val, int):
-        spot['length'] = None
-
-    spot.setdefault('explanation', None)
-
-    issue_type = (spot.get('issue_type') or '').strip()
-    spot['issue_type'] = issue_type if issue_type in ALLOWED_ISSUE_TYPES else 'other'
-
-    severity = (spot.get('severity') or '').strip().lower()
-    spot['severity'] = severity if severity in ALLOWED_SEVERITY else 'medium'
-
-    return spot
+ISSUE_CATEGORIES = {
+    'clarity': 'Понятность',
+    'redundancy': 'Стиль',
+    'bureaucracy': 'Стиль',
+    'filler': 'Лексика',
+    'passive_overuse': 'Грамматика',
+    'logic_gap': 'Структура',
+    'tone_mismatch': 'Стиль',
+    'term_misuse': 'Понятность',
+    'punctuation_error': 'Грамматика',
+    'wordiness': 'Стиль',
+    'other': 'Общее',
+}
 
 
 def get_issue_title(issue_type: str) -> str:
-    titles = {
-        'clarity': 'Неясная формулировка',
-        'redundancy': 'Избыточность текста',
-        'bureaucracy': 'Канцелярские обороты',
-        'filler': 'Слова-паразиты',
-        'passive_overuse': 'Злоупотребление пассивным залогом',
-        'logic_gap': 'Нарушение логики',
-        'tone_mismatch': 'Несоответствие тона',
-        'term_misuse': 'Сложная терминология',
-        'punctuation_error': 'Ошибки пунктуации',
-        'wordiness': 'Длинные предложения',
-        'other': 'Другие проблемы',
-    }
-    return titles.get(issue_type, 'Проблема текста')
+    return ISSUE_TITLES.get(issue_type, 'Проблема текста')
 
 
 def get_category_name(issue_type: str) -> str:
-    categories = {
-        'clarity': 'Понятность',
-        'redundancy': 'Стиль',
-        'bureaucracy': 'Стиль',
-        'filler': 'Лексика',
-        'passive_overuse': 'Грамматика',
-        'logic_gap': 'Структура',
-        'tone_mismatch': 'Стиль',
-        'term_misuse': 'Понятность',
-        'punctuation_error': 'Грамматика',
-        'wordiness': 'Стиль',
-        'other': 'Общее',
-    }
-    return categories.get(issue_type, 'Общее')
+    return ISSUE_CATEGORIES.get(issue_type, 'Общее')
 
 
 def add_good_practices(good_practices: list, issues_found: set, text: str):
@@ -120,7 +135,7 @@ def add_good_practices(good_practices: list, issues_found: set, text: str):
                 'category': 'Лексика',
             }
         )
-    if any(word in text.lower() for word in ['рекомендую', 'предлагаю', 'призываю', 'действие', 'решение']):
+    if _CALL_TO_ACTION_RE.search(text):
         good_practices.append(
             {
                 'title': 'Призыв к действию',
@@ -128,7 +143,7 @@ def add_good_practices(good_practices: list, issues_found: set, text: str):
                 'category': 'Заключение',
             }
         )
-    if any(word in text.lower() for word in ['например', 'пример', 'случай', 'ситуация']):
+    if _EXAMPLES_RE.search(text):
         good_practices.append(
             {
                 'title': 'Использование примеров',
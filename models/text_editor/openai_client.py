@@ -1,61 +1,185 @@
 import asyncio
 import logging
+import os
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
 
-from openai import OpenAI
+import httpx
+from openai import APIConnectionError, APIError, APIStatusError, AsyncOpenAI
+
+from .http_client import get_http_client
+from .parsing import extract_json, parse_json
+from .rate_limit import RateLimiter
+from .response_cache import cacheable, response_cache
+from .retry import MAX_ATTEMPTS
+from .tokens import MAX_COMPLETION_TOKENS, completion_budget, estimate_tokens, grown_budget
 
 logger = logging.getLogger(__name__)
 
 
 class OpenAIService:
-    def __init__(self, model: str = 'gpt-4o-mini'):
+    def __init__(
+        self,
+        model: str = 'gpt-4o-mini',
+        max_requests_per_minute: Optional[float] = None,
+        max_tokens_per_minute: Optional[float] = None,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        max_attempts: int = MAX_ATTEMPTS,
+    ):
         self.model = model
-        self.client = OpenAI()
+        self._rate_limiter = RateLimiter(
+            max_requests_per_minute or float(os.getenv('OPENAI_RPM', '500')),
+            max_tokens_per_minute or float(os.getenv('OPENAI_TPM', '200000')),
+        )
+        self._semaphore = asyncio.Semaphore(int(os.getenv('OPENAI_MAX_CONCURRENCY', '16')))
+        # The SDK retries connection errors, timeouts, 408/409/429 and 5xx with jittered backoff and honours
+        # retry-after; base_url/api_key point the same client at any OpenAI-compatible server, e.g. a local vLLM.
+        self.client = AsyncOpenAI(
+            base_url=base_url,
+            api_key=api_key,
+            max_retries=max_attempts - 1,
+            timeout=httpx.Timeout(60.0, connect=5.0),
+            http_client=get_http_client(),
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {'response_cache': response_cache.get_stats()}
 
     def _extract_json(self, text: str) -> str:
-        if '```json' in text:
-            json_start = text.find('```json') + 7
-            json_end = text.find('```', json_start)
-            if json_end != -1:
-                return text[json_start:json_end].strip()
-        if '```' in text:
-            json_start = text.find('```') + 3
-            json_end = text.find('```', json_start)
-            if json_end != -1:
-                return text[json_start:json_end].strip()
-        start_idx = text.find('{')
-        if start_idx == -1:
-            return text.strip()
-        brace_count = 0
-        for i, char in enumerate(text[start_idx:], start_idx):
-            if char == '{':
-                brace_count += 1
-            elif char == '}':
-                brace_count -= 1
-                if brace_count == 0:
-                    return text[start_idx : i + 1]
-        return text.strip()
-
-    async def analyze_text(self, prompt: str, text: str, expect_json: bool = False) -> str:
+        return extract_json(text)
+
+    def _build_request(
+        self,
+        prompt: str,
+        text: str,
+        expect_json: bool = False,
+        json_schema: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None,
+        model: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        model = model or self.model
         kwargs = {
-            'model': self.model,
+            'model': model,
             'messages': [{'role': 'system', 'content': prompt}, {'role': 'user', 'content': text}],
             'temperature': 0.3,
-            'max_tokens': 2000,
+            'max_tokens': max_tokens or completion_budget(text, model),
         }
-        if expect_json and 'gpt-4' in self.model:
+        if expect_json and json_schema and 'gpt-4o' in model:
+            # Structured outputs guarantee a reply that parses and matches the schema.
+            kwargs['response_format'] = {'type': 'json_schema', 'json_schema': json_schema}
+        elif expect_json and 'gpt-4' in model:
             kwargs['response_format'] = {'type': 'json_object'}
-        for attempt in range(3):
+        return kwargs
+
+    async def analyze_text(
+        self,
+        prompt: str,
+        text: str,
+        expect_json: bool = False,
+        json_schema: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None,
+        model: Optional[str] = None,
+        use_cache: bool = True,
+    ) -> str:
+        """json_schema is an OpenAI {'name', 'strict', 'schema'} spec; without it JSON mode falls back to json_object."""
+        raw, cache_key = await self._complete(prompt, text, expect_json, json_schema, max_tokens, model, use_cache)
+        content = self._extract_json(raw) if expect_json else raw
+        if cache_key and cacheable(content, expect_json):
+            response_cache.put(cache_key, raw)
+        return content
+
+    async def analyze_json(
+        self,
+        prompt: str,
+        text: str,
+        json_schema: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None,
+        model: Optional[str] = None,
+        use_cache: bool = True,
+    ) -> Dict[str, Any]:
+        """Like analyze_text with expect_json, but returns the decoded object; raises ValueError on a non-JSON reply."""
+        raw, cache_key = await self._complete(prompt, text, True, json_schema, max_tokens, model, use_cache)
+        data = parse_json(raw)
+        if not isinstance(data, dict):
+            raise ValueError('Expected a JSON object in the model reply')
+        if cache_key:
+            response_cache.put(cache_key, raw)
+        return data
+
+    async def _complete(
+        self,
+        prompt: str,
+        text: str,
+        expect_json: bool = False,
+        json_schema: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None,
+        model: Optional[str] = None,
+        use_cache: bool = True,
+    ) -> Tuple[str, Optional[str]]:
+        """Raw completion content and the key to cache it under once the caller has parsed it.
+
+        The key is None when the reply came from the cache, caching is off for the call, or the reply was cut off
+        at max_tokens, so truncated or unparseable replies are never served again.
+        """
+        kwargs = self._build_request(prompt, text, expect_json, json_schema, max_tokens, model)
+        # OpenAI counts the prompt plus the requested completion budget towards the TPM limit.
+        tokens_estimated = (
+            estimate_tokens(prompt, kwargs['model']) + estimate_tokens(text, kwargs['model']) + kwargs['max_tokens']
+        )
+        # base_url is part of the key, so a local server and the hosted API never share entries.
+        cache_key = response_cache.key({**kwargs, 'base_url': str(self.client.base_url)}) if use_cache else None
+        if cache_key:
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                return cached, None
+        while True:
+            await self._rate_limiter.acquire(tokens_estimated)
             try:
-                response = await asyncio.to_thread(self.client.chat.completions.create, **kwargs)
-                content = response.choices[0].message.content
-                return self._extract_json(content) if expect_json else content
-            except Exception as e:
-                error_str = str(e).lower()
-                is_retryable = any(k in error_str for k in ['rate_limit', '429', '503', 'timeout', 'server_error'])
-                if is_retryable and attempt < 2:
-                    wait_time = 2 * (attempt + 1)
-                    logger.warning(f'Retryable error, waiting {wait_time}s: {str(e)}')
-                    await asyncio.sleep(wait_time)
-                    continue
+                async with self._semaphore:
+                    response = await self.client.chat.completions.create(**kwargs)
+            except APIError as e:
                 logger.error(f'OpenAI API error: {str(e)}')
                 raise Exception(f'AI service error: {str(e)}')
+            choice = response.choices[0]
+            if choice.finish_reason != 'length':
+                return choice.message.content, cache_key
+            if kwargs['max_tokens'] >= MAX_COMPLETION_TOKENS:
+                return choice.message.content, None
+            # A truncated reply rarely parses, so it is asked for again with room to finish; the cache key stays
+            # that of the original request, so the next identical call gets the complete reply.
+            logger.warning(f'Reply cut off at {kwargs["max_tokens"]} tokens, retrying with more')
+            grown = grown_budget(kwargs['max_tokens'])
+            tokens_estimated += grown - kwargs['max_tokens']
+            kwargs = {**kwargs, 'max_tokens': grown}
+
+    async def stream_text(
+        self,
+        prompt: str,
+        text: str,
+        expect_json: bool = False,
+        max_tokens: Optional[int] = None,
+        on_finish: Optional[Callable[[Optional[str]], None]] = None,
+    ) -> AsyncIterator[str]:
+        """Yield the completion as it is generated; unlike analyze_text, a failed stream is not retried.
+
+        on_finish gets the finish reason once the stream ends, 'length' when max_tokens cut the reply off.
+        """
+        kwargs = self._build_request(prompt, text, expect_json, max_tokens=max_tokens)
+        await self._rate_limiter.acquire(
+            estimate_tokens(prompt, self.model) + estimate_tokens(text, self.model) + kwargs['max_tokens']
+        )
+        finish_reason = None
+        try:
+            async with self._semaphore:
+                stream = await self.client.chat.completions.create(**kwargs, stream=True)
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    finish_reason = chunk.choices[0].finish_reason or finish_reason
+                    if chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+        except (APIConnectionError, APIStatusError) as e:
+            logger.error(f'OpenAI API streaming error: {str(e)}')
+            raise Exception(f'AI service error: {str(e)}')
+        if on_finish is not None:
+            on_finish(finish_reason)
@@ -1,12 +1,34 @@
 import asyncio
 import logging
 import os
-from typing import Optional
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
 
 import httpx
+import orjson
+
+from .http_client import get_http_client
+from .parsing import extract_json, parse_json
+from .rate_limit import RateLimiter
+from .response_cache import cacheable, response_cache
+from .retry import MAX_ATTEMPTS, RETRYABLE_STATUS_CODES, backoff_delay
+from .tokens import MAX_COMPLETION_TOKENS, completion_budget, estimate_tokens, grown_budget
 
 logger = logging.getLogger(__name__)
 
+# Caps in-flight OpenRouter requests per process, however many services and tasks issue them.
+_CONCURRENCY = asyncio.Semaphore(int(os.getenv('OPENROUTER_MAX_CONCURRENCY', '16')))
+# All services share one account, so they also share one request/token budget.
+_RATE_LIMITER = RateLimiter(float(os.getenv('OPENROUTER_RPM', '500')), float(os.getenv('OPENROUTER_TPM', '400000')))
+
+
+def _cached_block(text: str) -> Dict[str, Any]:
+    return {'type': 'text', 'text': text, 'cache_control': {'type': 'ephemeral'}}
+
+
+def _min_cacheable_tokens(model: str) -> int:
+    # Anthropic ignores cache breakpoints on shorter prefixes, and still bills the marked request.
+    return 2048 if 'haiku' in model else 1024
+
 
 class OpenRouterService:
     def __init__(self, model: str = 'anthropic/claude-3.5-haiku'):
@@ -23,66 +45,133 @@ class OpenRouterService:
             'X-Title': 'LightPitch',  # Optional: for tracking
         }
 
+    def get_stats(self) -> Dict[str, Any]:
+        return {'response_cache': response_cache.get_stats()}
+
     def _extract_json(self, text: str) -> str:
         """Extract JSON from response text"""
-        if '```json' in text:
-            json_start = text.find('```json') + 7
-            json_end = text.find('```', json_start)
-            if json_end != -1:
-                return text[json_start:json_end].strip()
-        if '```' in text:
-            json_start = text.find('```') + 3
-            json_end = text.find('```', json_start)
-            if json_end != -1:
-                return text[json_start:json_end].strip()
-        start_idx = text.find('{')
-        if start_idx == -1:
-            return text.strip()
-        brace_count = 0
-        for i, char in enumerate(text[start_idx:], start_idx):
-            if char == '{':
-                brace_count += 1
-            elif char == '}':
-                brace_count -= 1
-                if brace_count == 0:
-                    return text[start_idx : i + 1]
-        return text.strip()
-
-    async def analyze_text(self, prompt: str, text: str, expect_json: bool = False) -> str:
-        """Analyze text using OpenRouter API"""
+        return extract_json(text)
+
+    def _build_payload(
+        self,
+        prompt: str,
+        text: str,
+        expect_json: bool = False,
+        json_schema: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None,
+        model: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        model = model or self.model
+        # OpenAI-compatible providers cache common prefixes automatically, so the stable prompt goes first.
         messages = [{'role': 'system', 'content': prompt}, {'role': 'user', 'content': text}]
+        if model.startswith('anthropic/') and estimate_tokens(prompt) >= _min_cacheable_tokens(model):
+            # Anthropic only caches prefixes marked explicitly; the system prompt is shared by every request of a
+            # kind, while the text rarely repeats and is served by the response cache when it does.
+            messages[0]['content'] = [_cached_block(prompt)]
 
         payload = {
-            'model': self.model,
+            'model': model,
             'messages': messages,
             'temperature': 0.3,
-            'max_tokens': 2000,
+            'max_tokens': max_tokens or completion_budget(text),
         }
 
+        # OpenRouter only enforces structured outputs for OpenAI models
+        if expect_json and json_schema and model.startswith('openai/'):
+            payload['response_format'] = {'type': 'json_schema', 'json_schema': json_schema}
         # For Claude models, we can request JSON format
-        if expect_json and 'claude' in self.model.lower():
+        elif expect_json and 'claude' in model.lower():
             payload['response_format'] = {'type': 'json_object'}
-
-        for attempt in range(3):
+        return payload
+
+    async def analyze_text(
+        self,
+        prompt: str,
+        text: str,
+        expect_json: bool = False,
+        json_schema: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None,
+        model: Optional[str] = None,
+        use_cache: bool = True,
+    ) -> str:
+        """Analyze text using OpenRouter API; model overrides the service default for this call."""
+        raw, cache_key = await self._complete(prompt, text, expect_json, json_schema, max_tokens, model, use_cache)
+        content = self._extract_json(raw) if expect_json else raw
+        if cache_key and cacheable(content, expect_json):
+            response_cache.put(cache_key, raw)
+        return content
+
+    async def analyze_json(
+        self,
+        prompt: str,
+        text: str,
+        json_schema: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None,
+        model: Optional[str] = None,
+        use_cache: bool = True,
+    ) -> Dict[str, Any]:
+        """Like analyze_text with expect_json, but returns the decoded object; raises ValueError on a non-JSON reply."""
+        raw, cache_key = await self._complete(prompt, text, True, json_schema, max_tokens, model, use_cache)
+        data = parse_json(raw)
+        if not isinstance(data, dict):
+            raise ValueError('Expected a JSON object in the model reply')
+        if cache_key:
+            response_cache.put(cache_key, raw)
+        return data
+
+    async def _complete(
+        self,
+        prompt: str,
+        text: str,
+        expect_json: bool = False,
+        json_schema: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None,
+        model: Optional[str] = None,
+        use_cache: bool = True,
+    ) -> Tuple[str, Optional[str]]:
+        """Raw completion content and the key to cache it under once the caller has parsed it.
+
+        The key is None when the reply came from the cache, caching is off for the call, or the reply was cut off
+        at max_tokens, so truncated or unparseable replies are never served again.
+        """
+        payload = self._build_payload(prompt, text, expect_json, json_schema, max_tokens, model)
+        cache_key = response_cache.key(payload) if use_cache else None
+        if cache_key:
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                return cached, None
+        tokens_estimated = estimate_tokens(prompt) + estimate_tokens(text) + payload['max_tokens']
+
+        for attempt in range(MAX_ATTEMPTS):
             try:
-                async with httpx.AsyncClient(timeout=60.0) as client:
-                    response = await client.post(
+                await _RATE_LIMITER.acquire(tokens_estimated)
+                async with _CONCURRENCY:
+                    response = await get_http_client().post(
                         f'{self.base_url}/chat/completions', headers=self.headers, json=payload
                     )
-                    response.raise_for_status()
-
-                    data = response.json()
-                    content = data['choices'][0]['message']['content']
-
-                    return self._extract_json(content) if expect_json else content
-
-            except httpx.HTTPStatusError as e:
-                error_str = str(e).lower()
-                is_retryable = any(k in error_str for k in ['rate_limit', '429', '503', 'timeout', 'server_error'])
-
-                if is_retryable and attempt < 2:
-                    wait_time = 2 * (attempt + 1)
-                    logger.warning(f'Retryable error, waiting {wait_time}s: {str(e)}')
+                response.raise_for_status()
+
+                choice = response.json()['choices'][0]
+                if choice.get('finish_reason') == 'length':
+                    if payload['max_tokens'] < MAX_COMPLETION_TOKENS and attempt < MAX_ATTEMPTS - 1:
+                        # A truncated reply rarely parses, so it is asked for again with room to finish.
+                        logger.warning(f'Reply cut off at {payload["max_tokens"]} tokens, retrying with more')
+                        grown = grown_budget(payload['max_tokens'])
+                        tokens_estimated += grown - payload['max_tokens']
+                        payload['max_tokens'] = grown
+                        continue
+                    cache_key = None
+                return choice['message']['content'], cache_key
+
+            except (httpx.HTTPStatusError, httpx.TransportError) as e:
+                # TransportError covers timeouts and connection failures.
+                is_http_error = isinstance(e, httpx.HTTPStatusError)
+                is_retryable = not is_http_error or e.response.status_code in RETRYABLE_STATUS_CODES
+
+                if is_retryable and attempt < MAX_ATTEMPTS - 1:
+                    retry_after = e.response.headers.get('retry-after') if is_http_error else None
+                    wait_time = backoff_delay(attempt, retry_after)
+                    logger.warning(f'Retryable error, waiting {wait_time:.1f}s: {str(e)}')
                     await asyncio.sleep(wait_time)
                     continue
 
@@ -90,14 +179,62 @@ class OpenRouterService:
                 raise Exception(f'AI service error: {str(e)}')
 
             except Exception as e:
-                error_str = str(e).lower()
-                is_retryable = any(k in error_str for k in ['rate_limit', '429', '503', 'timeout', 'server_error'])
-
-                if is_retryable and attempt < 2:
-                    wait_time = 2 * (attempt + 1)
-                    logger.warning(f'Retryable error, waiting {wait_time}s: {str(e)}')
-                    await asyncio.sleep(wait_time)
-                    continue
-
                 logger.error(f'OpenRouter API error: {str(e)}')
                 raise Exception(f'AI service error: {str(e)}')
+
+    async def stream_text(
+        self,
+        prompt: str,
+        text: str,
+        expect_json: bool = False,
+        max_tokens: Optional[int] = None,
+        json_schema: Optional[Dict[str, Any]] = None,
+        model: Optional[str] = None,
+        on_finish: Optional[Callable[[Optional[str]], None]] = None,
+    ) -> AsyncIterator[str]:
+        """Yield the completion as it is generated; unlike analyze_text, a failed stream is not retried.
+
+        on_finish gets the finish reason once the stream ends, 'length' when max_tokens cut the reply off.
+        """
+        payload = self._build_payload(prompt, text, expect_json, json_schema, max_tokens, model)
+        payload['stream'] = True
+        cache_key = response_cache.key(payload)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            if on_finish is not None:
+                on_finish('stop')
+            return
+        await _RATE_LIMITER.acquire(estimate_tokens(prompt) + estimate_tokens(text) + payload['max_tokens'])
+        chunks = []
+        finish_reason = None
+        try:
+            # The stream holds its connection until the last chunk, so it counts against the cap the whole time.
+            async with _CONCURRENCY:
+                async with get_http_client().stream(
+                    'POST', f'{self.base_url}/chat/completions', headers=self.headers, json=payload
+                ) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        # Server-sent events; lines starting with ':' are keep-alive comments
+                        if not line.startswith('data: '):
+                            continue
+                        data = line[len('data: ') :]
+                        if data == '[DONE]':
+                            break
+                        choices = orjson.loads(data).get('choices') or []
+                        if not choices:
+                            continue
+                        finish_reason = choices[0].get('finish_reason') or finish_reason
+                        delta = choices[0].get('delta', {}).get('content')
+                        if delta:
+                            chunks.append(delta)
+                            yield delta
+        except (httpx.HTTPStatusError, httpx.TransportError) as e:
+            logger.error(f'OpenRouter API streaming error: {str(e)}')
+            raise Exception(f'AI service error: {str(e)}')
+        if on_finish is not None:
+            on_finish(finish_reason)
+        content = ''.join(chunks)
+        if finish_reason != 'length' and cacheable(extract_json(content) if expect_json else content, expect_json):
+            response_cache.put(cache_key, content)
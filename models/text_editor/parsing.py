@@ -0,0 +1,56 @@
+import json
+import re
+from typing import Any
+
+import orjson
+
+_JSON_FENCE = re.compile(r'```(?:json)?\s*(\{.*?\})\s*```', re.DOTALL)
+_DECODER = json.JSONDecoder()
+
+
+def extract_json(text: str) -> str:
+    """Return the JSON object embedded in an LLM reply, with or without a ``` fence around it."""
+    m = _JSON_FENCE.search(text)
+    if m:
+        return m.group(1)
+    idx = text.find('{')
+    if idx == -1:
+        return text.strip()
+    try:
+        # raw_decode stops at the brace that closes the first object, so the scan happens in C;
+        # passing the start index avoids copying the reply tail first.
+        _, end = _DECODER.raw_decode(text, idx)
+    except json.JSONDecodeError:
+        return text.strip()
+    return text[idx:end]
+
+
+def parse_json(text: str) -> Any:
+    """Decode the JSON embedded in an LLM reply in a single pass; raises ValueError when there is none."""
+    try:
+        # Structured-output replies are bare JSON, so the fast path needs no search at all.
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
+        pass
+    m = _JSON_FENCE.search(text)
+    if m:
+        return orjson.loads(m.group(1))
+    idx = text.find('{')
+    if idx == -1:
+        raise ValueError('No JSON object in the model reply')
+    obj, _ = _DECODER.raw_decode(text, idx)
+    return obj
+
+
+def to_strict_json_schema(schema: Any) -> Any:
+    """Adapt a Pydantic JSON schema to OpenAI strict mode: every property required, no extra keys or defaults."""
+    if isinstance(schema, list):
+        return [to_strict_json_schema(item) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+    strict = {k: to_strict_json_schema(v) for k, v in schema.items() if k not in ('default', 'title')}
+    if strict.get('type') == 'object' and 'properties' in strict:
+        strict['properties'] = {name: to_strict_json_schema(prop) for name, prop in schema['properties'].items()}
+        strict['required'] = list(strict['properties'])
+        strict['additionalProperties'] = False
+    return strict
@@ -66,6 +66,33 @@ WEAK_SPOTS_PROMPT = """
 """
 
 
+# Appended to WEAK_SPOTS_PROMPT so the same call also writes the overall feedback.
+WEAK_SPOTS_FEEDBACK_SUFFIX = """
+ДОПОЛНИТЕЛЬНО — ОБЩАЯ ОЦЕНКА:
+Помимо weak_spots и global_recommendations добавь в тот же JSON-объект поля:
+- "feedback": краткая общая оценка текста (2-4 предложения) с учётом найденных проблем; если проблем мало или нет — похвали автора
+- "strengths": ["сильная сторона 1", "сильная сторона 2"]
+- "areas_for_improvement": ["область для улучшения 1", "область для улучшения 2"]
+Используй конструктивный тон.
+"""
+
+
+# Appended to WEAK_SPOTS_PROMPT so the same call also edits the text; filled in with str.format.
+WEAK_SPOTS_PROCESSING_SUFFIX = """
+ДОПОЛНИТЕЛЬНО — РЕДАКТУРА:
+Слабые места ищи в исходном тексте, затем отредактируй его.
+ПАРАМЕТРЫ ОБРАБОТКИ: {processing_params}
+ЦЕЛЕВОЙ СТИЛЬ: {target_style}
+ЗАДАЧИ:
+{tasks}
+Сохраняй смысл исходного текста и не искажай факты.
+Помимо weak_spots и global_recommendations добавь в тот же JSON-объект поля:
+- "processed_text": итоговый отредактированный текст
+- "changes_summary": ["краткое описание внесённых изменений"]
+- "processing_details": объект с полями parasites_removed (число), bureaucracy_simplified, passive_voice_changed, structure_added (boolean) и style_transformed ("casual", "professional", "scientific" или null)
+"""
+
+
 COMBINED_PROCESSING_PROMPT = """
 Ты — эксперт-редактор текста. Язык входного текста: {language}.
 
@@ -85,10 +112,6 @@ COMBINED_PROCESSING_PROMPT = """
 - Строго верни ВАЛИДНЫЙ JSON без обрамляющих ``` и без преамбулы по следующей схеме:
 {{
   "processed_text": "итоговый отредактированный текст",
-  "speech_time_original": number,  
-  "word_count_original": number,
-  "speech_time_final": number,
-  "word_count_final": number,
   "changes_summary": ["краткое описание внесённых изменений"],
   "processing_details": {{
     "parasites_removed": number,
@@ -99,14 +122,15 @@ COMBINED_PROCESSING_PROMPT = """
   }}
 }}
 Пояснения:
-- speech_time_* рассчитывай из слов в минуту: 150 слов/мин.
 - Если какое‑то преобразование не применялось, укажи соответствующие значения по смыслу.
 """
 
 FEEDBACK_GENERATION_PROMPT = """
 Ты — эксперт-аналитик текста. Язык входного текста: {language}.
 
-Проанализируй текст и сгенерируй общую оценку на основе найденных проблем и рекомендаций.
+Сгенерируй общую оценку текста на основе найденных проблем и рекомендаций.
+Сам текст не передаётся: в сообщении пользователя JSON с полями counts (число проблем по типам),
+samples (до 5 фрагментов текста с проблемами) и words (количество слов).
 
 ДАННЫЕ ДЛЯ АНАЛИЗА:
 - Найденные слабые места: {weak_spots_summary}
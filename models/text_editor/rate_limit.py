@@ -0,0 +1,39 @@
+import asyncio
+import time
+
+
+class RateLimiter:
+    """Request and token buckets refilled continuously, so calls wait locally instead of bouncing off a 429."""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._rpm_bucket = requests_per_minute
+        self._tpm_bucket = tokens_per_minute
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens_estimated: int) -> None:
+        """Wait until both the request and the token bucket can cover one more call."""
+        # A single call larger than the whole budget would never fit, so it only has to drain a full bucket.
+        tokens = min(tokens_estimated, self.tokens_per_minute)
+        while True:
+            async with self._lock:
+                now = time.monotonic()
+                elapsed = now - self._last_refill
+                self._last_refill = now
+                self._rpm_bucket = min(
+                    self.requests_per_minute, self._rpm_bucket + elapsed * self.requests_per_minute / 60.0
+                )
+                self._tpm_bucket = min(
+                    self.tokens_per_minute, self._tpm_bucket + elapsed * self.tokens_per_minute / 60.0
+                )
+                if self._rpm_bucket >= 1 and self._tpm_bucket >= tokens:
+                    self._rpm_bucket -= 1
+                    self._tpm_bucket -= tokens
+                    return
+                wait_time = max(
+                    (1 - self._rpm_bucket) * 60.0 / self.requests_per_minute,
+                    (tokens - self._tpm_bucket) * 60.0 / self.tokens_per_minute,
+                )
+            await asyncio.sleep(wait_time)
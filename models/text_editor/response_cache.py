@@ -0,0 +1,64 @@
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import orjson
+
+from .parsing import parse_json
+
+
+class ResponseCache:
+    """Exact-match LRU of LLM replies, keyed by a hash of the full request payload."""
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(payload: Dict[str, Any]) -> str:
+        return hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: str) -> None:
+        if self.max_size <= 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+def cacheable(content: str, expect_json: bool) -> bool:
+    """Whether a reply is fit to be served again: JSON replies must parse, so a bad one is retried next time."""
+    if not expect_json:
+        return bool(content)
+    try:
+        parse_json(content)
+    except ValueError:
+        return False
+    return True
+
+
+# Shared by every client in the process, so identical requests from different services hit the same entry.
+response_cache = ResponseCache(int(os.getenv('LLM_CACHE_SIZE', '1024')))
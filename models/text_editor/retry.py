@@ -0,0 +1,15 @@
+import random
+from typing import Optional
+
+MAX_ATTEMPTS = 5
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def backoff_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Seconds to wait before the next attempt: the server's Retry-After if given, else exponential with jitter."""
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+    return min(60, 2**attempt) + random.uniform(0, 1)
@@ -0,0 +1,105 @@
+import bisect
+import time
+from typing import List, Optional
+
+import numpy as np
+import orjson
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+
+class SemanticCache:
+    """LLM replies keyed by prompt embeddings; a lookup hits when cosine similarity reaches threshold.
+
+    Embeddings are kept L2-normalized in a preallocated float16 matrix. Search goes through a FAISS
+    inner-product index when faiss is installed and falls back to a numpy matrix product otherwise.
+    Entries older than ttl seconds are misses and are dropped on the next put.
+    """
+
+    def __init__(self, dim: int, capacity: int = 10000, threshold: float = 0.95, ttl: Optional[float] = None):
+        self.dim = dim
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl = ttl
+        self._emb = np.zeros((capacity, dim), dtype=np.float16)
+        self._values: List[str] = []
+        # Insertion times, ascending, so expired entries always form a prefix.
+        self._times: List[float] = []
+        self._index = faiss.IndexFlatIP(dim) if faiss is not None else None
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def _normalize(self, embedding) -> np.ndarray:
+        vec = np.asarray(embedding, dtype=np.float32).reshape(1, self.dim)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def get(self, embedding) -> Optional[str]:
+        if not self._values:
+            return None
+        query = self._normalize(embedding)
+        if self._index is not None:
+            sims, ids = self._index.search(query, 1)
+            sim, idx = float(sims[0, 0]), int(ids[0, 0])
+        else:
+            sims = self._emb[: len(self)] @ query[0].astype(np.float16)
+            idx = int(np.argmax(sims))
+            sim = float(sims[idx])
+        if sim < self.threshold or self._expired(self._times[idx], time.time()):
+            return None
+        return self._values[idx]
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl is not None and now - stored_at > self.ttl
+
+    def put(self, embedding, value: str) -> None:
+        now = time.time()
+        if self.ttl is not None:
+            expired = bisect.bisect_left(self._times, now - self.ttl)
+            if expired:
+                self._evict_oldest(expired)
+        if len(self) == self.capacity:
+            self._evict_oldest(max(1, self.capacity // 2))
+        vec = self._normalize(embedding)
+        self._emb[len(self)] = vec[0]
+        self._values.append(value)
+        self._times.append(now)
+        if self._index is not None:
+            self._index.add(vec)
+
+    def _evict_oldest(self, count: int) -> None:
+        # A flat index cannot drop rows in place, so eviction is done in bulk and the index rebuilt once.
+        keep = len(self) - count
+        self._emb[:keep] = self._emb[count : len(self)]
+        self._values = self._values[count:]
+        self._times = self._times[count:]
+        if self._index is not None:
+            self._index.reset()
+            self._index.add(self._emb[:keep].astype(np.float32))
+
+    def save(self, path: str) -> None:
+        """Write the embeddings to path.npy and the cached replies with their timestamps to path.json."""
+        np.save(f'{path}.npy', self._emb[: len(self)])
+        meta = {'threshold': self.threshold, 'ttl': self.ttl, 'values': self._values, 'times': self._times}
+        with open(f'{path}.json', 'wb') as f:
+            f.write(orjson.dumps(meta))
+
+    @classmethod
+    def load(cls, path: str, capacity: int = 10000) -> 'SemanticCache':
+        emb = np.load(f'{path}.npy', mmap_mode='r')
+        with open(f'{path}.json', 'rb') as f:
+            meta = orjson.loads(f.read())
+        cache = cls(
+            dim=emb.shape[1], capacity=max(capacity, len(emb)), threshold=meta['threshold'], ttl=meta.get('ttl')
+        )
+        count = len(emb)
+        cache._emb[:count] = emb
+        cache._values = meta['values']
+        cache._times = meta.get('times') or [time.time()] * count
+        if cache._index is not None and count:
+            cache._index.add(cache._emb[:count].astype(np.float32))
+        return cache
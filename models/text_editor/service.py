@@ -1,99 +1,497 @@
-import json
+import asyncio
 import logging
-from typing import Any, Dict, List, Tuple
+import os
+import re
+import string
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 
-from .normalizers import normalize_weak_spot
+import orjson
+from pydantic import TypeAdapter, ValidationError
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+from .normalizers import remove_parasites
+from .openai_client import OpenAIService
 from .openrouter_client import OpenRouterService
-from .prompts import COMBINED_PROCESSING_PROMPT, WEAK_SPOTS_PROMPT, FEEDBACK_GENERATION_PROMPT
-from .types import AnalysisType, TextStyle, WeakSpot
+from .parsing import extract_json, to_strict_json_schema
+from .prompts import (
+    COMBINED_PROCESSING_PROMPT,
+    FEEDBACK_GENERATION_PROMPT,
+    WEAK_SPOTS_FEEDBACK_SUFFIX,
+    WEAK_SPOTS_PROCESSING_SUFFIX,
+    WEAK_SPOTS_PROMPT,
+)
+from .semantic_cache import SemanticCache
+from .tokens import MAX_COMPLETION_TOKENS, estimate_tokens, grown_budget
+from .types import AnalysisType, TextStyle, WeakSpot, WeakSpotsResult, _coerce_int
 
 logger = logging.getLogger(__name__)
 
+# Validates a whole weak-spots list in one call into pydantic-core instead of one model per item.
+_WEAK_SPOTS_ADAPTER = TypeAdapter(List[WeakSpot])
+
+WEAK_SPOTS_JSON_SCHEMA = {
+    'name': 'weak_spots',
+    'strict': True,
+    'schema': to_strict_json_schema(WeakSpotsResult.model_json_schema()),
+}
+
+
+# Shorter inputs have nothing to analyze or rewrite, so they are returned as-is without an LLM call.
+MIN_WORDS_FOR_ANALYSIS = 5
+
+# The only recommendation of a weak-spots result whose reply could not be parsed.
+_WEAK_SPOTS_FAILED = 'Не удалось обработать анализ слабых мест'
+
+
+@lru_cache(maxsize=64)
+def _word_count(text: str) -> int:
+    # str.split runs in C and beats a \S+ regex scan about 4x; the cache covers one request counting the same
+    # text in several steps (a str caches its hash, so a hit costs no rescan).
+    return len(text.split())
+
+
+def _is_trivial(text: str) -> bool:
+    return _word_count(text) < MIN_WORDS_FOR_ANALYSIS
+
+
+def _weak_spots_budget(text: str) -> int:
+    # Each spot quotes a short fragment but adds an explanation and a suggestion, so dense texts can outgrow
+    # their input; a reply that still stops at the limit is retried by the client with a larger budget.
+    return min(MAX_COMPLETION_TOKENS, estimate_tokens(text) + 1000)
+
+
+# Longer texts are rewritten paragraph by paragraph in parallel, unless a task needs the whole text at once.
+SHARD_MIN_CHARS = 2000
+_PARAGRAPH_SPLIT_RE = re.compile(r'\n\s*\n')
+_GLOBAL_CONTEXT_TYPES = frozenset({AnalysisType.STRUCTURE_BLOCKS, AnalysisType.STYLE_TRANSFORM})
+
+# Weak spots and the rewrite share one reply only while it stays short: the reply holds the spots plus a
+# rewrite of about the input's size, and past ~2000 output tokens two parallel calls finish sooner.
+FUSE_MAX_TEXT_TOKENS = 1000
+
+
+def _weak_spots_sink(weak_spots: List[WeakSpot], recommendations: List[str]):
+    """ijson event target that validates each weak spot as soon as its object closes."""
+    builder = None
+    while True:
+        prefix, event, value = yield
+        if prefix == 'weak_spots.item' and event == 'start_map':
+            builder = ijson.ObjectBuilder()
+        if builder is not None:
+            builder.event(event, value)
+            if prefix == 'weak_spots.item' and event == 'end_map':
+                weak_spots.append(WeakSpot.model_validate(builder.value))
+                builder = None
+        elif prefix == 'global_recommendations.item' and event == 'string':
+            recommendations.append(value)
+
+
+@lru_cache(maxsize=1)
+def _embedding_model():
+    # Imported lazily: sentence-transformers pulls in torch, which is only needed when the semantic cache is on.
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(os.getenv('SEMANTIC_CACHE_MODEL', 'paraphrase-multilingual-mpnet-base-v2'))
+
+
+@lru_cache(maxsize=1024)
+def _embed(text: str):
+    return _embedding_model().encode(text, normalize_embeddings=True)
+
+
+_PROMPTS: Dict[str, str] = {
+    'weak_spots': WEAK_SPOTS_PROMPT,
+    'combined_processing': COMBINED_PROCESSING_PROMPT,
+    'feedback_generation': FEEDBACK_GENERATION_PROMPT,
+}
+
+# The combined template split once into (literal, field) pairs; Formatter.parse already unescapes {{ and }}.
+_COMBINED_PARTS = [(literal, field) for literal, field, _, _ in string.Formatter().parse(COMBINED_PROCESSING_PROMPT)]
+
+
+@lru_cache(maxsize=64)
+def _render_combined(processing_params: str, target_style: str, language: str, tasks: str) -> str:
+    values = {
+        'processing_params': processing_params,
+        'target_style': target_style,
+        'language': language,
+        'tasks': tasks,
+    }
+    return ''.join(literal + values[field] if field else literal for literal, field in _COMBINED_PARTS)
+
+
+@lru_cache(maxsize=8)
+def _weak_spots_prompt(language: str) -> str:
+    return _PROMPTS['weak_spots'].replace('{{LANG}}', language)
+
+
+# Legacy score groups in display order: (issue type, title, density weight, label when clean, metric label).
+_LEGACY_GROUPS = (
+    ('punctuation_error', 'Орфография и пунктуация', 1.0, 'Ошибок не обнаружено', 'Ошибки пунктуации'),
+    ('bureaucracy', 'Канцеляризмы', 1.1, 'Канцеляризмов не обнаружено', 'Канцеляризмов'),
+    ('filler', 'Слова‑паразиты', 1.2, 'Паразитов не обнаружено', 'Встречи слов‑паразитов'),
+    ('passive_overuse', 'Пассивный залог', 1.0, 'Нет избыточного пассивного залога', 'Случаи пассивного залога'),
+    ('logic_gap', 'Структура', 1.3, 'Логических разрывов не обнаружено', 'Логические разрывы'),
+)
+
+# Combined-processing tasks in prompt order; the type's value is also its processing parameter name.
+_COMBINED_TASKS = (
+    (AnalysisType.REMOVE_PARASITES, '- Удали слова-паразиты, сохранив естественность'),
+    (AnalysisType.REMOVE_BUREAUCRACY, '- Упрости канцелярские обороты и бюрократические выражения'),
+    (AnalysisType.REMOVE_PASSIVE, '- Замени пассивный залог на активный где возможно'),
+    (AnalysisType.STRUCTURE_BLOCKS, '- Структурируй текст по смысловым блокам с заголовками'),
+)
+_COMBINED_TYPES = frozenset(analysis_type for analysis_type, _ in _COMBINED_TASKS)
+
+
+def _llm_types(analysis_types: List[AnalysisType], style: TextStyle | None) -> List[AnalysisType]:
+    """Requested types the rewrite has a task for; speech time is computed locally and needs no call."""
+    return [t for t in analysis_types if t in _COMBINED_TYPES or (t == AnalysisType.STYLE_TRANSFORM and style)]
+
+
+_STYLE_DESCRIPTIONS = {
+    TextStyle.CASUAL: 'неформальный, разговорный',
+    TextStyle.PROFESSIONAL: 'профессиональный, деловой',
+    TextStyle.SCIENTIFIC: 'научный, академический',
+}
+
+# Issue types as they read inside a sentence of the feedback prompt ("3 канцеляризмы").
+_ISSUE_NAMES = {
+    'punctuation_error': 'ошибки пунктуации',
+    'filler': 'слова-паразиты',
+    'bureaucracy': 'канцеляризмы',
+    'passive_overuse': 'пассивный залог',
+    'logic_gap': 'логические разрывы',
+    'clarity': 'неясные формулировки',
+    'redundancy': 'повторы',
+    'tone_mismatch': 'несоответствие тона',
+    'term_misuse': 'неверное использование терминов',
+    'wordiness': 'избыточная длина предложений',
+    'other': 'другие проблемы',
+}
+
 
 class TextAnalysisService:
-    def __init__(self):
+    def __init__(self, weak_spots_model: Optional[str] = None):
         self.openai_service = OpenRouterService()
-        self.prompts = {
-            'weak_spots': WEAK_SPOTS_PROMPT,
-            'combined_processing': COMBINED_PROCESSING_PROMPT,
-            'feedback_generation': FEEDBACK_GENERATION_PROMPT,
-        }
+        # Weak-spot detection is a fixed-taxonomy classification, so it can run on a smaller model.
+        self.weak_spots_model = weak_spots_model or os.getenv('WEAK_SPOTS_MODEL')
+        local_url = os.getenv('LOCAL_LLM_URL')
+        self._local_service: Optional[OpenAIService] = None
+        if local_url:
+            # A single attempt: when the local server is down, the hosted model takes over right away.
+            self._local_service = OpenAIService(
+                model=os.getenv('LOCAL_LLM_MODEL', 'Qwen/Qwen2.5-3B-Instruct'),
+                base_url=local_url,
+                api_key='EMPTY',
+                max_attempts=1,
+            )
+        # One semantic cache per language, since the reply language follows the request.
+        self._semantic_caches: Optional[Dict[str, SemanticCache]] = (
+            {} if os.getenv('SEMANTIC_CACHE_ENABLED') == '1' else None
+        )
+        self._semantic_cache_ttl = float(os.getenv('SEMANTIC_CACHE_TTL', '86400'))
+        self._semantic_cache_path = os.getenv('SEMANTIC_CACHE_PATH')
 
-    async def analyze_weak_spots(self, text: str, language: str) -> Tuple[List[WeakSpot], List[str]]:
-        prompt = self.prompts['weak_spots'].replace('{{LANG}}', language)
-        response = await self.openai_service.analyze_text(prompt, text, expect_json=True)
+    def _load_prompts(self) -> Dict[str, str]:
+        return _PROMPTS
+
+    @property
+    def prompts(self) -> Dict[str, str]:
+        return self._load_prompts()
+
+    def _parse_weak_spots(self, response: str) -> Tuple[List[WeakSpot], List[str]]:
         try:
-            data = json.loads(response)
-            raw_spots = data.get('weak_spots', [])
-            weak_spots = [WeakSpot(**normalize_weak_spot(spot)) for spot in raw_spots]
-            recommendations = data.get('global_recommendations', [])
-            return weak_spots, recommendations
-        except (json.JSONDecodeError, TypeError, KeyError) as e:
+            return self._weak_spots_from_data(orjson.loads(response))
+        except (orjson.JSONDecodeError, ValidationError, TypeError, KeyError) as e:
             logger.warning(f'Failed to parse weak spots response: {e}')
-            return [], ['Не удалось обработать анализ слабых мест']
+            return [], [_WEAK_SPOTS_FAILED]
 
-    async def process_text_combined(
-        self, text: str, analysis_types: List[AnalysisType], style: TextStyle | None, language: str
-    ) -> Dict[str, Any]:
+    def _weak_spots_from_data(self, data: Dict[str, Any]) -> Tuple[List[WeakSpot], List[str]]:
+        raw_spots = data.get('weak_spots', [])
+        weak_spots = _WEAK_SPOTS_ADAPTER.validate_python(raw_spots)
+        recommendations = data.get('global_recommendations', [])
+        return weak_spots, recommendations
+
+    async def analyze_weak_spots(self, text: str, language: str) -> Tuple[List[WeakSpot], List[str]]:
+        if _is_trivial(text):
+            return [], []
+        cache: Optional[SemanticCache] = None
+        if self._semantic_caches is not None:
+            # Near-duplicate texts (re-submits after small edits) reuse the reply of the closest earlier text.
+            embedding = await asyncio.to_thread(_embed, text)
+            cache = self._semantic_cache(language, len(embedding))
+            cached = cache.get(embedding)
+            if cached is not None:
+                return self._parse_weak_spots(cached)
+        if ijson is not None and self._local_service is None:
+            try:
+                response, weak_spots, recommendations = await self._stream_weak_spots(text, language)
+            except Exception as e:
+                logger.warning(f'Weak spots stream failed, retrying without streaming: {e}')
+                response = await self._request_weak_spots(text, language)
+                weak_spots, recommendations = self._parse_weak_spots(response)
+        else:
+            response = await self._request_weak_spots(text, language)
+            weak_spots, recommendations = self._parse_weak_spots(response)
+        if cache is not None:
+            cache.put(embedding, response)
+        return weak_spots, recommendations
+
+    def _semantic_cache(self, language: str, dim: int) -> SemanticCache:
+        cache = self._semantic_caches.get(language)
+        if cache is None:
+            path = f'{self._semantic_cache_path}.{language}' if self._semantic_cache_path else None
+            if path and os.path.exists(f'{path}.npy'):
+                cache = SemanticCache.load(path, capacity=2048)
+                cache.ttl = self._semantic_cache_ttl
+            else:
+                cache = SemanticCache(dim=dim, capacity=2048, ttl=self._semantic_cache_ttl)
+            self._semantic_caches[language] = cache
+        return cache
+
+    def save_semantic_caches(self) -> None:
+        """Persist the semantic caches to SEMANTIC_CACHE_PATH, so a restart does not start cold."""
+        if not self._semantic_caches or not self._semantic_cache_path:
+            return
+        for language, cache in self._semantic_caches.items():
+            cache.save(f'{self._semantic_cache_path}.{language}')
+
+    async def _stream_weak_spots(self, text: str, language: str) -> Tuple[str, List[WeakSpot], List[str]]:
+        """Build weak spots while the reply streams in; also returns the raw reply for caching."""
+        weak_spots: List[WeakSpot] = []
+        recommendations: List[str] = []
+        sink = _weak_spots_sink(weak_spots, recommendations)
+        next(sink)
+        parser = ijson.parse_coro(sink, use_float=True)
+        chunks: List[str] = []
+        finish_reasons: List[Optional[str]] = []
+        started = failed = False
+        async for delta in self.openai_service.stream_text(
+            _weak_spots_prompt(language),
+            text,
+            expect_json=True,
+            max_tokens=_weak_spots_budget(text),
+            json_schema=WEAK_SPOTS_JSON_SCHEMA,
+            model=self.weak_spots_model,
+            on_finish=finish_reasons.append,
+        ):
+            chunks.append(delta)
+            if failed:
+                continue
+            if not started:
+                # Skip a ```json fence or any preamble before the object.
+                idx = delta.find('{')
+                if idx == -1:
+                    continue
+                started, delta = True, delta[idx:]
+            try:
+                parser.send(delta.encode())
+            except (ijson.JSONError, ValidationError):
+                failed = True
+        if finish_reasons == ['length']:
+            # A cut-off reply would only yield the spots before the cut, so it is asked again with a larger budget.
+            logger.warning('Weak spots stream hit max_tokens, retrying without streaming')
+            response = await self._request_weak_spots(text, language, grown_budget(_weak_spots_budget(text)))
+            return response, *self._parse_weak_spots(response)
+        response = extract_json(''.join(chunks))
+        if not failed:
+            try:
+                parser.close()
+            except ijson.JSONError:
+                failed = True
+        if failed or not started:
+            # Trailing fences and malformed items land here; the whole reply is parsed the regular way, and
+            # only a reply that still fails is requested again.
+            weak_spots, recommendations = self._parse_weak_spots(response)
+            if recommendations == [_WEAK_SPOTS_FAILED]:
+                response = await self._request_weak_spots(text, language)
+                weak_spots, recommendations = self._parse_weak_spots(response)
+        return response, weak_spots, recommendations
+
+    async def _request_weak_spots(self, text: str, language: str, max_tokens: Optional[int] = None) -> str:
+        max_tokens = max_tokens or _weak_spots_budget(text)
+        prompt = _weak_spots_prompt(language)
+        if self._local_service is not None:
+            try:
+                return await self._local_service.analyze_text(prompt, text, expect_json=True, max_tokens=max_tokens)
+            except Exception as e:
+                logger.warning(f'Local LLM unavailable, falling back to the hosted model: {e}')
+        return await self.openai_service.analyze_text(
+            prompt,
+            text,
+            expect_json=True,
+            json_schema=WEAK_SPOTS_JSON_SCHEMA,
+            max_tokens=max_tokens,
+            model=self.weak_spots_model,
+        )
+
+    def _combined_prompt(self, analysis_types: List[AnalysisType], style: TextStyle | None, language: str) -> str:
+        processing_params_str, target_style_str, tasks_str = self._processing_tasks(analysis_types, style)
+        return _render_combined(processing_params_str, target_style_str, language, tasks_str)
+
+    def _processing_tasks(self, analysis_types: List[AnalysisType], style: TextStyle | None) -> Tuple[str, str, str]:
+        """Processing parameters, target style and task list as they are filled into the prompts."""
+        requested = frozenset(analysis_types)
         processing_params: List[str] = []
         tasks: List[str] = []
+        for analysis_type, task in _COMBINED_TASKS:
+            if analysis_type in requested:
+                processing_params.append(analysis_type.value)
+                tasks.append(task)
+        if AnalysisType.STYLE_TRANSFORM in requested and style:
+            processing_params.append(AnalysisType.STYLE_TRANSFORM.value)
+            tasks.append(f'- Преобразуй в {_STYLE_DESCRIPTIONS.get(style, "указанный")} стиль')
+
+        target_style = style.value if style else 'не изменять'
+        return ', '.join(processing_params), target_style, '\n'.join(tasks)
+
+    def _unprocessed_result(self, text: str, changes_summary: List[str]) -> Dict[str, Any]:
+        return {
+            'processed_text': text,
+            'changes_summary': changes_summary,
+            'processing_details': {
+                'parasites_removed': 0,
+                'bureaucracy_simplified': False,
+                'passive_voice_changed': False,
+                'structure_added': False,
+                'style_transformed': None,
+            },
+        }
+
+    def _add_speech_stats(self, result: Dict[str, Any], original_text: str) -> Dict[str, Any]:
+        # Word counts and speaking time (150 words per minute) are computed here rather than by the model.
+        words_original = _word_count(original_text)
+        words_final = _word_count(result.get('processed_text') or original_text)
+        result['word_count_original'] = words_original
+        result['speech_time_original'] = words_original / 150
+        result['word_count_final'] = words_final
+        result['speech_time_final'] = words_final / 150
+        return result
+
+    async def _process_chunk(self, prompt: str, text: str, use_cache: bool = True) -> Dict[str, Any]:
+        if not text.strip():
+            return self._unprocessed_result(text, [])
+        # The processed text is about input-sized, but structure and style changes can lengthen it; the JSON
+        # envelope and summary come on top.
+        max_tokens = min(MAX_COMPLETION_TOKENS, 2 * estimate_tokens(text) + 800)
+        try:
+            result = await self.openai_service.analyze_json(prompt, text, max_tokens=max_tokens, use_cache=use_cache)
+        except ValueError as e:
+            logger.warning(f'Failed to parse combined processing response: {e}')
+            result = self._unprocessed_result(text, ['Обработка не удалась'])
+        if not isinstance(result.get('processed_text'), str):
+            logger.warning('Combined processing response has no processed text')
+            result = self._unprocessed_result(text, ['Обработка не удалась'])
+        return self._add_speech_stats(result, text)
 
+    def _merge_chunks(self, parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+        result = self._unprocessed_result('\n\n'.join(p.get('processed_text', '') for p in parts), [])
+        # Paragraphs often report the same kind of change, so the summary keeps each line once.
+        result['changes_summary'] = list(dict.fromkeys(c for p in parts for c in p.get('changes_summary', [])))
+        details = result['processing_details']
+        for part in parts:
+            for key, value in (part.get('processing_details') or {}).items():
+                if key == 'parasites_removed':
+                    # The model may report the count as a string ("3"), as it does for weak-spot positions.
+                    details[key] += _coerce_int(value, 0)
+                elif value:
+                    details[key] = value
+        return result
+
+    async def process_text_combined(
+        self,
+        text: str,
+        analysis_types: List[AnalysisType],
+        style: TextStyle | None,
+        language: str,
+        use_cache: bool = True,
+    ) -> Dict[str, Any]:
+        """use_cache=False asks the model again even when an identical request already has a cached reply."""
+        if not analysis_types or _is_trivial(text):
+            return self._add_speech_stats(self._unprocessed_result(text, []), text)
+
+        original_text = text
+        parasites_removed = 0
         if AnalysisType.REMOVE_PARASITES in analysis_types:
-            processing_params.append('remove_parasites')
-            tasks.append('- Удали слова-паразиты, сохранив естественность')
-        if AnalysisType.REMOVE_BUREAUCRACY in analysis_types:
-            processing_params.append('remove_bureaucracy')
-            tasks.append('- Упрости канцелярские обороты и бюрократические выражения')
-        if AnalysisType.REMOVE_PASSIVE in analysis_types:
-            processing_params.append('remove_passive')
-            tasks.append('- Замени пассивный залог на активный где возможно')
-        if AnalysisType.STRUCTURE_BLOCKS in analysis_types:
-            processing_params.append('structure_blocks')
-            tasks.append('- Структурируй текст по смысловым блокам с заголовками')
-        if AnalysisType.STYLE_TRANSFORM in analysis_types and style:
-            processing_params.append('style_transform')
-            style_descriptions = {
-                TextStyle.CASUAL: 'неформальный, разговорный',
-                TextStyle.PROFESSIONAL: 'профессиональный, деловой',
-                TextStyle.SCIENTIFIC: 'научный, академический',
-            }
-            tasks.append(f"- Преобразуй в {style_descriptions.get(style, 'указанный')} стиль")
+            # Fillers the regex can match safely are removed locally; the model still gets the task for the rest
+            # ("как бы", "типа" mid-clause), which only context tells apart from their literal meaning.
+            text, parasites_removed = remove_parasites(text)
 
-        tasks.append('- Рассчитай время выступления для исходного и финального текста')
+        llm_types = _llm_types(analysis_types, style)
+        paragraphs = _PARAGRAPH_SPLIT_RE.split(text) if len(text) > SHARD_MIN_CHARS else [text]
+        if not llm_types:
+            result = self._unprocessed_result(text, [])
+        elif len(paragraphs) > 1 and _GLOBAL_CONTEXT_TYPES.isdisjoint(llm_types):
+            prompt = self._combined_prompt(llm_types, style, language)
+            parts = await asyncio.gather(*(self._process_chunk(prompt, p, use_cache) for p in paragraphs))
+            result = self._merge_chunks(parts)
+        else:
+            prompt = self._combined_prompt(llm_types, style, language)
+            result = await self._process_chunk(prompt, text, use_cache)
 
-        processing_params_str = ', '.join(processing_params)
-        target_style_str = style.value if style else 'не изменять'
-        tasks_str = '\n'.join(tasks)
+        self._add_parasites_removed(result, parasites_removed)
+        return self._add_speech_stats(result, original_text)
 
-        prompt = self.prompts['combined_processing'].format(
-            processing_params=processing_params_str,
-            target_style=target_style_str,
-            language=language,
-            tasks=tasks_str,
+    def _add_parasites_removed(self, result: Dict[str, Any], parasites_removed: int) -> None:
+        if not parasites_removed:
+            return
+        details = result.get('processing_details')
+        if not isinstance(details, dict):
+            details = result['processing_details'] = {}
+        details['parasites_removed'] = (details.get('parasites_removed') or 0) + parasites_removed
+        result.setdefault('changes_summary', []).insert(0, f'Удалено слов-паразитов: {parasites_removed}')
+
+    async def analyze_and_process(
+        self, text: str, processing_types: List[AnalysisType], style: TextStyle | None, language: str
+    ) -> Tuple[List[WeakSpot], List[str], Dict[str, Any]]:
+        """Weak spots and combined processing of one text; short texts get both from a single call."""
+        llm_types = _llm_types(processing_types, style)
+        if not _is_trivial(text) and llm_types and estimate_tokens(text) <= FUSE_MAX_TEXT_TOKENS:
+            fused = await self._analyze_and_process_fused(text, llm_types, style, language)
+            if fused is not None:
+                return fused
+        (weak_spots, recommendations), result = await asyncio.gather(
+            self.analyze_weak_spots(text, language),
+            self.process_text_combined(text, processing_types, style, language),
         )
+        return weak_spots, recommendations, result
 
-        response = await self.openai_service.analyze_text(prompt, text, expect_json=True)
+    async def _analyze_and_process_fused(
+        self, text: str, llm_types: List[AnalysisType], style: TextStyle | None, language: str
+    ) -> Optional[Tuple[List[WeakSpot], List[str], Dict[str, Any]]]:
+        processing_params, target_style, tasks = self._processing_tasks(llm_types, style)
+        suffix = WEAK_SPOTS_PROCESSING_SUFFIX.format(
+            processing_params=processing_params, target_style=target_style, tasks=tasks
+        )
+        # The weak-spots budget plus room for the rewritten text.
+        max_tokens = min(MAX_COMPLETION_TOKENS, 3 * estimate_tokens(text) + 1000)
         try:
-            return json.loads(response)
-        except (json.JSONDecodeError, TypeError, KeyError) as e:
-            logger.warning(f'Failed to parse combined processing response: {e}')
-            words = len(text.split())
-            speech_time = words / 150
-            return {
-                'processed_text': text,
-                'speech_time_original': speech_time,
-                'word_count_original': words,
-                'speech_time_final': speech_time,
-                'word_count_final': words,
-                'changes_summary': ['Обработка не удалась'],
-                'processing_details': {
-                    'parasites_removed': 0,
-                    'bureaucracy_simplified': False,
-                    'passive_voice_changed': False,
-                    'structure_added': False,
-                    'style_transformed': None,
-                },
-            }
+            data = await self.openai_service.analyze_json(
+                _weak_spots_prompt(language) + suffix, text, max_tokens=max_tokens
+            )
+            weak_spots, recommendations = self._weak_spots_from_data(data)
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning(f'Failed to parse fused analysis response, falling back to separate calls: {e}')
+            return None
+        if not isinstance(data.get('processed_text'), str) or not data['processed_text']:
+            return None
+        result = {
+            'processed_text': data['processed_text'],
+            'changes_summary': data.get('changes_summary', []),
+            'processing_details': data.get('processing_details', {}),
+        }
+        if AnalysisType.REMOVE_PARASITES in llm_types:
+            # The model saw the original text so weak-spot positions match it; the same local pass as the
+            # separate path then runs on its rewrite, so both paths clean fillers alike.
+            result['processed_text'], parasites_removed = remove_parasites(result['processed_text'])
+            self._add_parasites_removed(result, parasites_removed)
+        return weak_spots, recommendations, self._add_speech_stats(result, text)
 
     def _score_by_issue_density(self, issues_count: int, words: int, weight: float = 1.0) -> float:
         words_safe = max(1, words)
@@ -109,68 +507,91 @@ class TextAnalysisService:
             'diagnostics': diagnostics,
         }
 
-    async def generate_feedback(self, text: str, weak_spots: List[WeakSpot], recommendations: List[str], language: str) -> Dict[str, Any]:
-        """Generate dynamic feedback based on analysis results"""
-        words = len(text.split())
-        speech_time_min = round(words / 150.0, 2)
-        
-        # Prepare summary of weak spots by type
-        by_type = {}
+    async def generate_feedback(
+        self, text: str, weak_spots: List[WeakSpot], recommendations: List[str], language: str
+    ) -> Dict[str, Any]:
+        """Overall feedback from the weak spots already found; the text itself is only counted, not sent again."""
+        issue_counts: Dict[str, int] = {}
         for ws in weak_spots:
-            by_type.setdefault(ws.issue_type, []).append(ws)
-        
+            issue_counts[ws.issue_type] = issue_counts.get(ws.issue_type, 0) + 1
+        samples = [ws.original_text for ws in weak_spots[:5]]
+        words = _word_count(text)
+        speech_time_min = round(words / 150.0, 2)
+
         weak_spots_summary = []
-        for issue_type, spots in by_type.items():
-            count = len(spots)
-            issue_names = {
-                'punctuation_error': 'ошибки пунктуации',
-                'filler': 'слова-паразиты', 
-                'bureaucracy': 'канцеляризмы',
-                'passive_overuse': 'пассивный залог',
-                'logic_gap': 'логические разрывы',
-                'clarity': 'неясные формулировки',
-                'redundancy': 'повторы',
-                'tone_mismatch': 'несоответствие тона',
-                'term_misuse': 'неверное использование терминов',
-                'wordiness': 'избыточная длина предложений',
-                'other': 'другие проблемы'
-            }
-            issue_name = issue_names.get(issue_type, issue_type)
-            weak_spots_summary.append(f"{count} {issue_name}")
-        
+        for issue_type, count in issue_counts.items():
+            weak_spots_summary.append(f'{count} {_ISSUE_NAMES.get(issue_type, issue_type)}')
+
         weak_spots_str = ', '.join(weak_spots_summary) if weak_spots_summary else 'проблем не найдено'
         recommendations_str = ', '.join(recommendations[:3]) if recommendations else 'специальных рекомендаций нет'
-        
+
         prompt = self.prompts['feedback_generation'].format(
             language=language,
             weak_spots_summary=weak_spots_str,
             recommendations_summary=recommendations_str,
             word_count=words,
-            speech_time_minutes=speech_time_min
+            speech_time_minutes=speech_time_min,
         )
-        
+
+        # Weak-spot analysis has already read the text, so the model only gets the summary, not the text again.
+        summary = orjson.dumps({'counts': issue_counts, 'samples': samples, 'words': words}).decode()
+        # The feedback is a few paragraphs and lists whatever the input size.
+        max_tokens = 1024
         try:
-            response = await self.openai_service.analyze_text(prompt, text, expect_json=True)
-            return json.loads(response)
-        except (json.JSONDecodeError, TypeError, KeyError) as e:
+            return await self.openai_service.analyze_json(prompt, summary, max_tokens=max_tokens)
+        except ValueError as e:
             logger.warning(f'Failed to parse feedback generation response: {e}')
-            # Fallback to basic feedback
-            if weak_spots:
-                return {
-                    'feedback': f'Текст содержит {len(weak_spots)} проблемных мест. Рекомендуется переработать текст для улучшения качества.',
-                    'strengths': ['Текст имеет базовую структуру'],
-                    'areas_for_improvement': ['Устранение найденных проблем', 'Улучшение стиля изложения']
-                }
-            else:
-                return {
-                    'feedback': 'Текст в целом хорошо структурирован и не содержит серьезных проблем.',
-                    'strengths': ['Хорошая структура', 'Отсутствие серьезных ошибок'],
-                    'areas_for_improvement': []
-                }
+            return self._fallback_feedback(sum(issue_counts.values()))
+
+    def _fallback_feedback(self, issues_total: int) -> Dict[str, Any]:
+        if issues_total:
+            return {
+                'feedback': f'Текст содержит {issues_total} проблемных мест. Рекомендуется переработать текст для улучшения качества.',
+                'strengths': ['Текст имеет базовую структуру'],
+                'areas_for_improvement': ['Устранение найденных проблем', 'Улучшение стиля изложения'],
+            }
+        return {
+            'feedback': 'Текст в целом хорошо структурирован и не содержит серьезных проблем.',
+            'strengths': ['Хорошая структура', 'Отсутствие серьезных ошибок'],
+            'areas_for_improvement': [],
+        }
+
+    def _unavailable_feedback(self) -> Dict[str, Any]:
+        return {
+            'feedback': 'Не удалось выполнить анализ текста. Попробуйте повторить запрос позже.',
+            'strengths': [],
+            'areas_for_improvement': [],
+        }
+
+    async def _analyze_with_feedback(
+        self, text: str, language: str
+    ) -> Tuple[List[WeakSpot], List[str], Dict[str, Any]]:
+        """Weak spots and overall feedback from a single call."""
+        if _is_trivial(text):
+            return [], [], self._fallback_feedback(0)
+        prompt = _weak_spots_prompt(language) + WEAK_SPOTS_FEEDBACK_SUFFIX
+        # Same budget as weak spots alone, plus room for the feedback fields.
+        max_tokens = min(MAX_COMPLETION_TOKENS, _weak_spots_budget(text) + 600)
+        try:
+            data = await self.openai_service.analyze_json(prompt, text, max_tokens=max_tokens)
+            weak_spots, recommendations = self._weak_spots_from_data(data)
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning(f'Failed to parse weak spots with feedback response, falling back to separate calls: {e}')
+            weak_spots, recommendations = await self.analyze_weak_spots(text, language)
+            if recommendations == [_WEAK_SPOTS_FAILED]:
+                # No spots here means no analysis, not a clean text, so the text is not praised.
+                return weak_spots, recommendations, self._unavailable_feedback()
+            feedback = await self.generate_feedback(text, weak_spots, recommendations, language)
+            return weak_spots, recommendations, feedback
+        if not data.get('feedback'):
+            # The spots are fine, so only the feedback is asked for again, from their summary.
+            feedback = await self.generate_feedback(text, weak_spots, recommendations, language)
+            return weak_spots, recommendations, feedback
+        return weak_spots, recommendations, data
 
     async def get_legacy_interface(self, text: str, language: str) -> Dict[str, Any]:
-        weak_spots, recommendations = await self.analyze_weak_spots(text, language)
-        words = len(text.split())
+        weak_spots, recommendations, feedback_data = await self._analyze_with_feedback(text, language)
+        words = _word_count(text)
         speech_time_min = round(words / 150.0, 2)
 
         by_type: Dict[str, list] = {}
@@ -198,62 +619,18 @@ class TextAnalysisService:
                 )
             return diags
 
-        ortho_spots = by_type.get('punctuation_error', [])
-        ortho_value = self._score_by_issue_density(len(ortho_spots), words, weight=1.0)
-        ortho_metrics = [
-            {'label': 'Ошибки пунктуации', 'value': len(ortho_spots)},
-            {'label': 'Количество слов', 'value': words},
-            {'label': 'Время речи (мин)', 'value': speech_time_min},
-        ]
-        ortho_group = self._build_group(
-            'Орфография и пунктуация', ortho_value, diag_from_spots(ortho_spots, 'Ошибок не обнаружено'), ortho_metrics
-        )
-
-        filler_spots = by_type.get('filler', [])
-        filler_value = self._score_by_issue_density(len(filler_spots), words, weight=1.2)
-        filler_metrics = [{'label': 'Встречи слов‑паразитов', 'value': len(filler_spots)}]
-        filler_group = self._build_group(
-            'Слова‑паразиты', filler_value, diag_from_spots(filler_spots, 'Паразитов не обнаружено'), filler_metrics
-        )
-
-        bur_spots = by_type.get('bureaucracy', [])
-        bur_value = self._score_by_issue_density(len(bur_spots), words, weight=1.1)
-        bur_metrics = [{'label': 'Канцеляризмов', 'value': len(bur_spots)}]
-        bur_group = self._build_group(
-            'Канцеляризмы', bur_value, diag_from_spots(bur_spots, 'Канцеляризмов не обнаружено'), bur_metrics
-        )
-
-        passive_spots = by_type.get('passive_overuse', [])
-        passive_value = self._score_by_issue_density(len(passive_spots), words, weight=1.0)
-        passive_metrics = [{'label': 'Случаи пассивного залога', 'value': len(passive_spots)}]
-        passive_group = self._build_group(
-            'Пассивный залог',
-            passive_value,
-            diag_from_spots(passive_spots, 'Нет избыточного пассивного залога'),
-            passive_metrics,
-        )
-
-        structure_spots = by_type.get('logic_gap', [])
-        structure_value = self._score_by_issue_density(len(structure_spots), words, weight=1.3)
-        structure_metrics = [{'label': 'Логические разрывы', 'value': len(structure_spots)}]
-        structure_group = self._build_group(
-            'Структура',
-            structure_value,
-            diag_from_spots(structure_spots, 'Логических разрывов не обнаружено'),
-            structure_metrics,
-        )
+        groups = []
+        for issue_type, name, weight, ok_label, metric_label in _LEGACY_GROUPS:
+            spots = by_type.get(issue_type, [])
+            metrics = [{'label': metric_label, 'value': len(spots)}]
+            if issue_type == 'punctuation_error':
+                metrics += [
+                    {'label': 'Количество слов', 'value': words},
+                    {'label': 'Время речи (мин)', 'value': speech_time_min},
+                ]
+            value = self._score_by_issue_density(len(spots), words, weight=weight)
+            groups.append(self._build_group(name, value, diag_from_spots(spots, ok_label), metrics))
 
-        groups = [
-            ortho_group,
-            bur_group,
-            filler_group,
-            passive_group,
-            structure_group,
-        ]
-
-        # Generate dynamic feedback using AI
-        feedback_data = await self.generate_feedback(text, weak_spots, recommendations, language)
-        
         return {
             'groups': groups,
             'feedback': feedback_data.get('feedback', 'Анализ завершен'),
@@ -261,3 +638,10 @@ class TextAnalysisService:
             'areas_for_improvement': feedback_data.get('areas_for_improvement', []),
             'recommendations': recommendations[:7],
         }
+
+
+@lru_cache(maxsize=1)
+def get_analysis_service() -> TextAnalysisService:
+    # One lazily created instance for every request: its clients share the connection pool, and its semantic
+    # caches only pay off when every request reads and fills the same ones.
+    return TextAnalysisService()
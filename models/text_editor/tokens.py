@@ -0,0 +1,38 @@
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding('o200k_base')
+
+
+def estimate_tokens(text: str, model: str = 'gpt-4o-mini') -> int:
+    """Token count of text for model; falls back to ~3 characters per token when tiktoken is not installed."""
+    if tiktoken is None:
+        # Cyrillic splits into more tokens than English, so stay on the high side.
+        return len(text) // 3 + 1
+    return len(_encoding(model).encode(text))
+
+
+# Ceiling for any single reply; a reply cut off below it is requested again with a larger budget.
+MAX_COMPLETION_TOKENS = 4096
+
+
+def completion_budget(
+    text: str, model: str = 'gpt-4o-mini', cap: int = MAX_COMPLETION_TOKENS, floor: int = 1024
+) -> int:
+    """max_tokens sized to the input, so short texts do not reserve a full reply's worth of TPM."""
+    return max(floor, min(cap, estimate_tokens(text, model) + floor))
+
+
+def grown_budget(max_tokens: int) -> int:
+    """Budget for asking again after a reply stopped at max_tokens."""
+    return min(MAX_COMPLETION_TOKENS, 2 * max_tokens)
@@ -1,9 +1,11 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
 from typing import Any, Dict, List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
+
+from .normalizers import ALLOWED_ISSUE_TYPES, ALLOWED_SEVERITY
 
 
 class TextStyle(str, Enum):
@@ -22,23 +24,76 @@ class AnalysisType(str, Enum):
     STYLE_TRANSFORM = 'style_transform'
 
 
+def _coerce_int(value: Any, default: Optional[int]) -> Optional[int]:
+    if isinstance(value, str):
+        try:
+            return int(float(value))
+        except ValueError:
+            return default
+    if isinstance(value, float):
+        return int(value)
+    return value if isinstance(value, int) else default
+
+
 class WeakSpot(BaseModel):
-    position: int
+    position: int = 0
     length: Optional[int] = None
     original_text: str
-    issue_type: str
+    issue_type: str = 'other'
     explanation: Optional[str] = None
     suggestion: str
-    severity: str
+    severity: str = 'medium'
+
+    # LLM replies are loose about types and vocabulary, so values are coerced here instead of rejected.
+    @field_validator('position', mode='before')
+    @classmethod
+    def _coerce_position(cls, value: Any) -> int:
+        return _coerce_int(value, 0)
+
+    @field_validator('length', mode='before')
+    @classmethod
+    def _coerce_length(cls, value: Any) -> Optional[int]:
+        return _coerce_int(value, None)
+
+    @field_validator('issue_type', mode='before')
+    @classmethod
+    def _coerce_issue_type(cls, value: Any) -> str:
+        issue_type = value.strip() if isinstance(value, str) else ''
+        return issue_type if issue_type in ALLOWED_ISSUE_TYPES else 'other'
+
+    @field_validator('severity', mode='before')
+    @classmethod
+    def _coerce_severity(cls, value: Any) -> str:
+        severity = value.strip().lower() if isinstance(value, str) else ''
+        return severity if severity in ALLOWED_SEVERITY else 'medium'
+
+
+class WeakSpotsResult(BaseModel):
+    weak_spots: List[WeakSpot]
+    global_recommendations: List[str]
 
 
 class ProcessingStep(BaseModel):
     step_name: str
-    input_text: str
+    # None when the step's input is the request's original text, which is already stored once.
+    input_text: Optional[str] = None
     output_text: str
     changes_made: List[str]
     metadata: Dict[str, Any] = Field(default_factory=dict)
 
+    # Both come straight from the processing reply, so a malformed one yields an empty field, not an error.
+    @field_validator('changes_made', mode='before')
+    @classmethod
+    def _coerce_changes(cls, value: Any) -> List[str]:
+        if isinstance(value, str):
+            return [value] if value.strip() else []
+        return [str(change) for change in value if change] if isinstance(value, list) else []
+
+    @field_validator('metadata', mode='before')
+    @classmethod
+    def _coerce_metadata(cls, value: Any) -> Dict[str, Any]:
+        return value if isinstance(value, dict) else {}
+
 
 class TextAnalysisRequest(BaseModel):
     text: str = Field(..., min_length=1, max_length=10000, description='Text to analyze')
@@ -70,7 +125,7 @@ class TextRecommendationsResponse(BaseModel):
     timestamp: datetime
 
 
-@dataclass
+@dataclass(slots=True)
 class AnalysisState:
     original_text: str
     current_text: str
@@ -83,8 +138,4 @@ class AnalysisState:
     final_speech_time_minutes: Optional[float] = None
     word_count: int = 0
     final_word_count: int = 0
-    metadata: Dict[str, Any] = None
-
-    def __post_init__(self):
-        if self.metadata is None:
-            self.metadata = {}
+    metadata: Dict[str, Any] = field(default_factory=dict)
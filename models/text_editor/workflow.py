@@ -1,54 +1,117 @@
+from collections import OrderedDict
+from typing import Tuple
+
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import END, StateGraph
 
-from .service import TextAnalysisService
-from .types import AnalysisState, AnalysisType
+from .service import get_analysis_service
+from .types import AnalysisState, AnalysisType, ProcessingStep
+
+
+class BoundedMemorySaver(MemorySaver):
+    """MemorySaver that keeps checkpoints of at most max_threads threads, evicting the least recently used."""
+
+    def __init__(self, max_threads: int = 1000, **kwargs):
+        super().__init__(**kwargs)
+        self.max_threads = max_threads
+        # thread_id -> (its keys in self.writes, its keys in self.blobs), so eviction never scans other threads.
+        self._threads: OrderedDict = OrderedDict()
+
+    def _thread_keys(self, thread_id: str) -> Tuple[set, set]:
+        keys = self._threads.get(thread_id)
+        if keys is None:
+            keys = self._threads[thread_id] = (set(), set())
+        self._threads.move_to_end(thread_id)
+        return keys
+
+    def _evict(self) -> None:
+        while len(self._threads) > self.max_threads:
+            evicted, (write_keys, blob_keys) = self._threads.popitem(last=False)
+            self.storage.pop(evicted, None)
+            for key in write_keys:
+                self.writes.pop(key, None)
+            # Channel values (texts, processing steps) live in blobs, so they are the bulk of what is freed.
+            for key in blob_keys:
+                self.blobs.pop(key, None)
+
+    def get_tuple(self, config):
+        checkpoint_tuple = super().get_tuple(config)
+        thread_id = config['configurable']['thread_id']
+        if thread_id in self._threads:
+            self._threads.move_to_end(thread_id)
+        return checkpoint_tuple
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        next_config = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = config['configurable']['thread_id']
+        checkpoint_ns = config['configurable'].get('checkpoint_ns', '')
+        _, blob_keys = self._thread_keys(thread_id)
+        blob_keys.update((thread_id, checkpoint_ns, channel, version) for channel, version in new_versions.items())
+        self._evict()
+        return next_config
+
+    def put_writes(self, config, writes, task_id, *args, **kwargs):
+        super().put_writes(config, writes, task_id, *args, **kwargs)
+        configurable = config['configurable']
+        write_keys, _ = self._thread_keys(configurable['thread_id'])
+        write_keys.add(
+            (configurable['thread_id'], configurable.get('checkpoint_ns', ''), configurable['checkpoint_id'])
+        )
+        self._evict()
 
 
 def create_analysis_workflow() -> StateGraph:
     workflow = StateGraph(AnalysisState)
 
-    async def analyze_weak_spots_node(state: AnalysisState) -> AnalysisState:
-        if AnalysisType.WEAK_SPOTS in state.analysis_types:
-            service = TextAnalysisService()
+    async def parallel_analysis_node(state: AnalysisState) -> AnalysisState:
+        service = get_analysis_service()
+        processing_types = [t for t in state.analysis_types if t != AnalysisType.WEAK_SPOTS]
+        run_weak_spots = AnalysisType.WEAK_SPOTS in state.analysis_types
+
+        if not (run_weak_spots or processing_types) or not state.original_text.strip():
+            return state
+
+        if run_weak_spots and processing_types:
+            # The service answers both from one call for short texts and runs them in parallel otherwise.
+            weak_spots, recommendations, result = await service.analyze_and_process(
+                state.original_text, processing_types, state.style, state.language
+            )
+        elif run_weak_spots:
             weak_spots, recommendations = await service.analyze_weak_spots(state.original_text, state.language)
+        else:
+            result = await service.process_text_combined(
+                state.original_text, processing_types, state.style, state.language
+            )
+
+        if run_weak_spots:
             state.weak_spots = weak_spots
             state.metadata['weak_spots_recommendations'] = recommendations
-        return state
 
-    async def combined_processing_node(state: AnalysisState) -> AnalysisState:
-        processing_types = [t for t in state.analysis_types if t != AnalysisType.WEAK_SPOTS]
         if processing_types:
-            service = TextAnalysisService()
-            result = await service.process_text_combined(
-                state.original_text, processing_types, state.style, state.language
-            )
-            state.current_text = result.get('processed_text', state.original_text)
+            processed_text = result.get('processed_text')
+            state.current_text = processed_text if isinstance(processed_text, str) else state.original_text
             state.speech_time_minutes = result.get('speech_time_original')
             state.word_count = result.get('word_count_original', 0)
-            state.final_speech_time_minutes = result.get('final_speech_time')
+            state.final_speech_time_minutes = result.get('speech_time_final')
             state.final_word_count = result.get('word_count_final', 0)
             state.processing_steps.append(
-                {
-                    'step_name': 'Комплексная обработка',
-                    'input_text': state.original_text,
-                    'output_text': state.current_text,
-                    'changes_made': result.get('changes_summary', []),
-                    'metadata': result.get('processing_details', {}),
-                }
+                ProcessingStep(
+                    step_name='Комплексная обработка',
+                    output_text=state.current_text,
+                    changes_made=result.get('changes_summary', []),
+                    metadata=result.get('processing_details', {}),
+                )
             )
         return state
 
-    workflow.add_node('analyze_weak_spots', analyze_weak_spots_node)
-    workflow.add_node('combined_processing', combined_processing_node)
+    workflow.add_node('parallel_analysis', parallel_analysis_node)
 
-    workflow.set_entry_point('analyze_weak_spots')
-    workflow.add_edge('analyze_weak_spots', 'combined_processing')
-    workflow.add_edge('combined_processing', END)
+    workflow.set_entry_point('parallel_analysis')
+    workflow.add_edge('parallel_analysis', END)
 
     return workflow
 
 
 analysis_workflow = create_analysis_workflow()
-memory = MemorySaver()
+memory = BoundedMemorySaver()
 app_graph = analysis_workflow.compile(checkpointer=memory)
@@ -1,15 +1,47 @@
 import re
+from typing import Optional, Tuple
 
 from langchain_core.runnables import Runnable
 
+# Only braces, quotes and backslashes change the scanner state, so everything in between is skipped in C.
+_SIGNIFICANT_RE = re.compile(r'[{}"\\]')
 
-class JsonExtractor(Runnable):
-    json_pattern = r'\{.*?\}'
 
-    def invoke(self, input_data: str, *args) -> str:
-        matches = re.findall(JsonExtractor.json_pattern, input_data, re.DOTALL)
+def _last_object_span(text: str) -> Optional[Tuple[int, int]]:
+    """Span of the last balanced top-level {...} block, ignoring braces inside JSON strings."""
+    depth = 0
+    start = -1
+    in_string = False
+    skip_until = -1
+    span = None
+    for m in _SIGNIFICANT_RE.finditer(text):
+        i = m.start()
+        if i < skip_until:
+            continue
+        ch = text[i]
+        if in_string:
+            if ch == '\\':
+                skip_until = i + 2
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            # Quotes in the prose around the object do not open strings.
+            in_string = depth > 0
+        elif ch == '{':
+            if depth == 0:
+                start = i
+            depth += 1
+        elif ch == '}' and depth:
+            depth -= 1
+            if depth == 0:
+                span = (start, i + 1)
+    return span
+
 
-        if matches:
-            return matches[-1].strip().replace('\\\\', '\\')
+class JsonExtractor(Runnable):
+    def invoke(self, input_data: str, *args) -> str:
+        span = _last_object_span(input_data)
+        if span:
+            return input_data[span[0] : span[1]]
 
         return input_data
@@ -1,13 +1,67 @@
 import json
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, Optional
 
 import cv2
 import mediapipe as mp
 import numpy as np
+import orjson
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# FaceMesh indices of the EAR points p1..p6 of each eye.
+_LEFT_EYE = np.array([33, 160, 158, 133, 153, 144])
+_RIGHT_EYE = np.array([362, 385, 387, 263, 373, 380])
+# Frames sent to a worker process per task, to amortize the pickling round trip.
+_FRAMES_PER_TASK = 8
+
+
+# Landmark math kernels: plain scalar code, so they run as is and are compiled to machine code when numba is installed.
+def _distance(points, a, b):
+    return math.hypot(points[a, 0] - points[b, 0], points[a, 1] - points[b, 1])
+
+
+def _ear_kernel(points, idx):
+    vertical = _distance(points, idx[1], idx[5]) + _distance(points, idx[2], idx[4])
+    return vertical / (2.0 * _distance(points, idx[0], idx[3]) + 1e-6)
+
+
+def _smile_kernel(points):
+    # Lips 13/14 (upper/lower) and mouth corners 61/291; y grows downwards.
+    corner_raise = 0.5 * (points[13, 1] + points[14, 1]) - 0.5 * (points[61, 1] + points[291, 1])
+    face_h = _distance(points, 10, 152)
+    eye_dist = _distance(points, 33, 263)
+    mouth_width = _distance(points, 61, 291)
+    return corner_raise / (face_h + 1e-6) > 0.003 and mouth_width / (eye_dist + 1e-6) > 0.75
+
+
+if njit is not None:
+    _distance = njit(cache=True, fastmath=True)(_distance)
+    _ear_kernel = njit(cache=True, fastmath=True)(_ear_kernel)
+    _smile_kernel = njit(cache=True, fastmath=True)(_smile_kernel)
+
+
+def _warm_up_kernels() -> None:
+    # numba compiles (or loads from its cache) on the first call per signature; with the same float32 (478, 2)
+    # points as refined FaceMesh output, that happens when a grader is built (in-process or in a pool worker)
+    # instead of on its first frame. Later graders only hit the already compiled dispatch.
+    points = np.zeros((478, 2), dtype=np.float32)
+    _ear_kernel(points, _LEFT_EYE)
+    _smile_kernel(points)
 
 
 class VideoGrader:
     def __init__(self):
         # --- MediaPipe solutions
+        # Sampled frames are a second or more apart (and not adjacent at all within a pool worker), so every
+        # frame gets full detection: tracking and landmark smoothing would assume ~33 ms steps and lag behind.
         self.mp_pose = mp.solutions.pose
         self.pose = self.mp_pose.Pose(
             static_image_mode=True,
@@ -21,6 +75,7 @@ class VideoGrader:
         self.face = self.mp_face.FaceMesh(
             static_image_mode=True,
             max_num_faces=1,
+            # Refinement also sharpens the eye and lip contours the EAR and smile thresholds were tuned on.
             refine_landmarks=True,
             min_detection_confidence=0.5,
         )
@@ -31,37 +86,33 @@ class VideoGrader:
         self.SHOULDERS_Z_DIFF_THR = 0.20  # |z_L - z_R| below -> facing camera
         self.SHOULDERS_MIN_WIDTH = 0.10  # |x_L - x_R| above -> not fully profile
 
+        if njit is not None:
+            _warm_up_kernels()
+
     # =======================
     # Face helpers
     # =======================
-    def _eye_aspect_ratio(self, landmarks, eye_indices) -> float:
+    @staticmethod
+    def _face_points(landmarks) -> np.ndarray:
+        """(N, 2) float32 array of landmark x, y, built once per frame instead of per distance."""
+        return np.fromiter((c for lm in landmarks for c in (lm.x, lm.y)), dtype=np.float32).reshape(-1, 2)
+
+    def _eye_aspect_ratio(self, points: np.ndarray, eye_indices: np.ndarray) -> float:
         """Eye Aspect Ratio (EAR) for eye openness.
         EAR = (||p2-p6|| + ||p3-p5||) / (2 * ||p1-p4||)
         """
-        p1, p2, p3, p4, p5, p6 = [landmarks[i] for i in eye_indices]
-        vertical1 = np.linalg.norm(np.array([p2.x, p2.y]) - np.array([p6.x, p6.y]))
-        vertical2 = np.linalg.norm(np.array([p3.x, p3.y]) - np.array([p5.x, p5.y]))
-        horizontal = np.linalg.norm(np.array([p1.x, p1.y]) - np.array([p4.x, p4.y]))
-        return (vertical1 + vertical2) / (2.0 * horizontal + 1e-6)
+        return float(_ear_kernel(points, eye_indices))
 
-    def _analyze_eyes(self, frame) -> dict:
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.face.process(frame_rgb)
-
-        if not results.multi_face_landmarks:
+    def _analyze_eyes(self, points) -> dict:
+        if points is None:
             return {
                 'left_eye': 'not_visible',
                 'right_eye': 'not_visible',
                 'both_eyes_visible_open': False,
             }
 
-        face_landmarks = results.multi_face_landmarks[0].landmark
-
-        LEFT_EYE = [33, 160, 158, 133, 153, 144]
-        RIGHT_EYE = [362, 385, 387, 263, 373, 380]
-
-        left_ear = self._eye_aspect_ratio(face_landmarks, LEFT_EYE)
-        right_ear = self._eye_aspect_ratio(face_landmarks, RIGHT_EYE)
+        left_ear = self._eye_aspect_ratio(points, _LEFT_EYE)
+        right_ear = self._eye_aspect_ratio(points, _RIGHT_EYE)
 
         def eye_status(ear: float) -> str:
             if ear < 0.12:
@@ -80,50 +131,16 @@ class VideoGrader:
             'both_eyes_visible_open': both_eyes_visible_open,
         }
 
-    def _detect_smile_like(self, frame) -> bool:
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.face.process(frame_rgb)
-        if not results.multi_face_landmarks:
+    def _detect_smile_like(self, points) -> bool:
+        if points is None:
             return False
-
-        lm = results.multi_face_landmarks[0].landmark
-
-        left_corner = lm[61]
-        right_corner = lm[291]
-        upper_lip = lm[13]
-        lower_lip = lm[14]
-
-        left_eye_outer = lm[33]
-        right_eye_outer = lm[263]
-        top_face = lm[10]
-        chin = lm[152]
-
-        mouth_center_y = 0.5 * (upper_lip.y + lower_lip.y)
-        corners_avg_y = 0.5 * (left_corner.y + right_corner.y)
-
-        corner_raise = mouth_center_y - corners_avg_y
-
-        face_h = np.linalg.norm(np.array([top_face.x, top_face.y]) - np.array([chin.x, chin.y]))
-        eye_dist = np.linalg.norm(
-            np.array([left_eye_outer.x, left_eye_outer.y]) - np.array([right_eye_outer.x, right_eye_outer.y])
-        )
-        mouth_width = np.linalg.norm(
-            np.array([left_corner.x, left_corner.y]) - np.array([right_corner.x, right_corner.y])
-        )
-
-        corner_raise_norm = corner_raise / (face_h + 1e-6)
-        width_ratio = mouth_width / (eye_dist + 1e-6)
-
-        return (corner_raise_norm > 0.003) and (width_ratio > 0.75)
+        return bool(_smile_kernel(points))
 
     @staticmethod
     def _in_frame_xy(lm):
         return (0.0 <= lm.x <= 1.0) and (0.0 <= lm.y <= 1.0)
 
-    def _analyze_pose(self, frame) -> dict:
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.pose.process(frame_rgb)
-
+    def _analyze_pose(self, results) -> dict:
         out = {
             'pose_detected': False,
             'hands_present': False,
@@ -158,30 +175,50 @@ class VideoGrader:
             width = abs(ls.x - rs.x)
             out['pose'] = (z_diff < self.SHOULDERS_Z_DIFF_THR) and (width > self.SHOULDERS_MIN_WIDTH)
 
-        out['landmarks'] = [{'id': i, 'x': lm.x, 'y': lm.y, 'z': lm.z, 'v': lm.visibility} for i, lm in enumerate(lms)]
+        # (33, 4) float32 rows of x, y, z, visibility, indexed by landmark id.
+        out['landmarks'] = np.fromiter(
+            (c for lm in lms for c in (lm.x, lm.y, lm.z, lm.visibility)), dtype=np.float32, count=len(lms) * 4
+        ).reshape(-1, 4)
         return out
 
-    def split_video(self, video_path: str, step_seconds: int = 1) -> list:
+    def split_video(self, video_path: str, step_seconds: int = 1) -> Iterator[np.ndarray]:
+        """Yield one frame every step_seconds, so the sampled frames are never all held in memory."""
         cap = cv2.VideoCapture(video_path)
         fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
         frame_interval = max(1, int(fps * step_seconds))
-
-        frames = []
-        frame_id = 0
-        success, frame = cap.read()
-        while success:
-            if frame_id % frame_interval == 0:
-                frames.append(frame.copy())
-            success, frame = cap.read()
-            frame_id += 1
-
-        cap.release()
-        return frames
+        # A seek restarts decoding from the previous keyframe, which only pays off for gaps longer than a
+        # typical GOP (1-2 s); shorter gaps are skipped with grab(), which skips read()'s BGR conversion.
+        seek = frame_interval > 2 * fps
+
+        try:
+            frame_id = 0
+            while True:
+                success, frame = cap.read()
+                if not success:
+                    return
+                yield frame
+                frame_id += frame_interval
+                if seek:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_id)
+                    continue
+                for _ in range(frame_interval - 1):
+                    if not cap.grab():
+                        return
+        finally:
+            cap.release()
 
     def process_frame(self, frame) -> dict:
-        pose_data = self._analyze_pose(frame)
-        eye_data = self._analyze_eyes(frame)
-        smile_like = self._detect_smile_like(frame)
+        # Each model runs once per frame; the eye and smile heuristics share the same face landmarks.
+        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        pose_data = self._analyze_pose(self.pose.process(frame_rgb))
+        face_results = self.face.process(frame_rgb)
+        points = (
+            self._face_points(face_results.multi_face_landmarks[0].landmark)
+            if face_results.multi_face_landmarks
+            else None
+        )
+        eye_data = self._analyze_eyes(points)
+        smile_like = self._detect_smile_like(points)
 
         pose_data['open_pose'] = pose_data.get('pose', False)
 
@@ -190,16 +227,34 @@ class VideoGrader:
 
         return pose_data
 
-    def analyze_frames(self, frames: list) -> list:
+    def analyze_frames(self, frames: Iterable[np.ndarray], workers: Optional[int] = None) -> list:
+        """Process frames in order; with workers > 1 (default: VIDEO_GRADER_WORKERS) they are spread over processes."""
+        workers = workers or int(os.getenv('VIDEO_GRADER_WORKERS', '1'))
+        if workers > 1:
+            processed = self._process_in_pool(frames, workers)
+        else:
+            processed = map(self.process_frame, frames)
+
         results = []
-        for i, frame in enumerate(frames):
-            frame_result = self.process_frame(frame)
+        for i, frame_result in enumerate(processed):
             frame_result['frame_id'] = i
             results.append(frame_result)
         return results
 
+    @staticmethod
+    def _process_in_pool(frames: Iterable[np.ndarray], workers: int) -> Iterator[dict]:
+        # Frames are taken from the generator a window at a time, so memory stays bounded on long videos.
+        window = workers * _FRAMES_PER_TASK
+        frames = iter(frames)
+        # Spawned workers start from a clean interpreter: forking the server would copy its event loop, threads
+        # and locks into every child.
+        mp_context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context, initializer=_init_worker) as executor:
+            while batch := list(islice(frames, window)):
+                yield from executor.map(_process_in_worker, batch, chunksize=_FRAMES_PER_TASK)
+
     def to_json(self, analysis_results: list) -> str:
-        return json.dumps(analysis_results, indent=2)
+        return orjson.dumps(analysis_results, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY).decode()
 
     def final_score(self, analysis_results: list) -> dict:
         total_frames = len(analysis_results)
@@ -223,14 +278,21 @@ class VideoGrader:
                 ],
             }
 
-        eyes_frames = sum(1 for r in analysis_results if r.get('both_eyes_visible_open'))
-        smile_present = any(bool(r.get('smile_like')) for r in analysis_results)
-        gest_frames = sum(1 for r in analysis_results if r.get('hands_present'))
-        pose_frames = sum(1 for r in analysis_results if r.get('pose') or r.get('open_pose'))
-
-        eyes_score = eyes_frames / total_frames
-        gesticulation_ratio = gest_frames / total_frames
-        pose_ratio = pose_frames / total_frames
+        # One pass over the results into an (N, 4) boolean matrix, then the ratios are column means.
+        flags = np.array(
+            [
+                (
+                    r.get('both_eyes_visible_open'),
+                    r.get('hands_present'),
+                    r.get('pose') or r.get('open_pose'),
+                    r.get('smile_like'),
+                )
+                for r in analysis_results
+            ],
+            dtype=bool,
+        )
+        eyes_score, gesticulation_ratio, pose_ratio = (float(ratio) for ratio in flags[:, :3].mean(axis=0))
+        smile_present = bool(flags[:, 3].any())
 
         composite = float(np.mean([eyes_score, gesticulation_ratio, pose_ratio]) - 0.05 * int(not smile_present))
 
@@ -281,6 +343,19 @@ class VideoGrader:
         }
 
 
+# MediaPipe graphs are not safe to share across a fork, so every worker process builds its own grader.
+_worker_grader: Optional[VideoGrader] = None
+
+
+def _init_worker() -> None:
+    global _worker_grader
+    _worker_grader = VideoGrader()
+
+
+def _process_in_worker(frame: np.ndarray) -> dict:
+    return _worker_grader.process_frame(frame)
+
+
 if __name__ == '__main__':
     grader = VideoGrader()
 
@@ -0,0 +1,9 @@
+import pytest
+
+from models.text_editor import tokens
+
+
+@pytest.fixture(autouse=True)
+def offline_token_estimates(monkeypatch):
+    # tiktoken downloads its encodings on first use; the character estimate keeps the suite offline.
+    monkeypatch.setattr(tokens, 'tiktoken', None)
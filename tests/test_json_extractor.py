@@ -0,0 +1,25 @@
+import pytest
+
+from models.utils.JsonExtractor import JsonExtractor, _last_object_span
+
+
+@pytest.mark.parametrize(
+    ('text', 'expected'),
+    [
+        ('{"a": 1}', '{"a": 1}'),
+        ('Черновик {"a": 1}, итог {"a": {"b": 2}}', '{"a": {"b": 2}}'),
+        ('{"text": "скобки { и } в строке"}', '{"text": "скобки { и } в строке"}'),
+        ('{"text": "кавычка \\" и }"} конец', '{"text": "кавычка \\" и }"}'),
+        ('{"path": "C:\\\\"} ', '{"path": "C:\\\\"}'),
+        ('Модель сказала "вот" и {"a": 1}', '{"a": 1}'),
+    ],
+)
+def test_returns_the_last_top_level_object(text, expected):
+    assert JsonExtractor().invoke(text) == expected
+
+
+def test_unbalanced_text_is_returned_as_is():
+    text = 'Ответ: {"a": {"b": 1}'
+
+    assert _last_object_span(text) is None
+    assert JsonExtractor().invoke(text) == text
@@ -0,0 +1,27 @@
+import pytest
+
+from models.text_editor.normalizers import remove_parasites
+
+
+@pytest.mark.parametrize(
+    ('text', 'expected'),
+    [
+        ('Я, ну, думаю', 'Я думаю'),
+        ('Это, короче, проблема', 'Это проблема'),
+        ('Мы, э, решили', 'Мы решили'),
+        ('Я, ну, типа, думаю', 'Я думаю'),
+        ('Я думаю, э.', 'Я думаю.'),
+        ('Когда мы пришли, э мы решили', 'Когда мы пришли, мы решили'),
+        ('Ну, давайте начнём.', 'Давайте начнём.'),
+        ('Э, ну, мы начали. Вот, итог.', 'Мы начали. Итог.'),
+    ],
+)
+def test_removes_fillers_with_their_commas(text, expected):
+    cleaned, removed = remove_parasites(text)
+    assert cleaned == expected
+    assert removed > 0
+
+
+@pytest.mark.parametrize('text', ['Вот дом.', 'Это как бы важно', 'Типа данных нет', 'Эмма пришла'])
+def test_keeps_words_that_are_not_set_off_as_fillers(text):
+    assert remove_parasites(text) == (text, 0)
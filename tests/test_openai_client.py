@@ -0,0 +1,43 @@
+import asyncio
+from types import SimpleNamespace
+
+from models.text_editor.openai_client import OpenAIService
+from models.text_editor.tokens import MAX_COMPLETION_TOKENS
+
+
+def _reply(content: str, finish_reason: str) -> SimpleNamespace:
+    choice = SimpleNamespace(finish_reason=finish_reason, message=SimpleNamespace(content=content))
+    return SimpleNamespace(choices=[choice])
+
+
+def _service(replies):
+    """Service whose completions come from replies in order; returns it with the max_tokens of each call."""
+    service = OpenAIService(api_key='test')
+    budgets = []
+
+    async def create(**kwargs):
+        budgets.append(kwargs['max_tokens'])
+        return replies.pop(0)
+
+    service.client.chat.completions.create = create
+    return service, budgets
+
+
+def test_truncated_reply_is_retried_with_a_larger_budget():
+    service, budgets = _service([_reply('{"a": [1,', 'length'), _reply('{"a": [1, 2]}', 'stop')])
+
+    data = asyncio.run(service.analyze_json('prompt', 'Текст для проверки бюджета', max_tokens=300))
+
+    assert data == {'a': [1, 2]}
+    assert budgets == [300, 600]
+
+
+def test_reply_truncated_at_the_ceiling_is_returned_but_not_cached():
+    service, budgets = _service([_reply('обрыв', 'length'), _reply('полный ответ', 'stop')])
+
+    async def ask_twice():
+        text = 'Текст, ответ на который обрывается'
+        return [await service.analyze_text('prompt', text, max_tokens=MAX_COMPLETION_TOKENS) for _ in range(2)]
+
+    assert asyncio.run(ask_twice()) == ['обрыв', 'полный ответ']
+    assert budgets == [MAX_COMPLETION_TOKENS, MAX_COMPLETION_TOKENS]
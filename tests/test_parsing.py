@@ -0,0 +1,36 @@
+import pytest
+
+from models.text_editor.parsing import extract_json, parse_json
+
+
+@pytest.mark.parametrize(
+    ('reply', 'expected'),
+    [
+        ('{"a": 1}', '{"a": 1}'),
+        ('Вот ответ:\n```json\n{"a": {"b": [1, 2]}}\n```', '{"a": {"b": [1, 2]}}'),
+        ('Ответ: {"a": {"b": {}}} — готово. {"c": 2}', '{"a": {"b": {}}}'),
+        ('{"text": "скобка } внутри строки"} хвост', '{"text": "скобка } внутри строки"}'),
+        ('{"text": "кавычка \\" и { скобка"}', '{"text": "кавычка \\" и { скобка"}'),
+        ('без JSON', 'без JSON'),
+    ],
+)
+def test_extract_json(reply, expected):
+    assert extract_json(reply) == expected
+
+
+@pytest.mark.parametrize(
+    ('reply', 'expected'),
+    [
+        ('{"a": 1}', {'a': 1}),
+        ('```json\n{"a": "}"}\n```', {'a': '}'}),
+        ('Результат: {"a": {"b": "\\"{\\""}} и ещё текст', {'a': {'b': '"{"'}}),
+    ],
+)
+def test_parse_json(reply, expected):
+    assert parse_json(reply) == expected
+
+
+@pytest.mark.parametrize('reply', ['без JSON', '{"a": [1, 2'])
+def test_parse_json_raises_value_error(reply):
+    with pytest.raises(ValueError):
+        parse_json(reply)
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from models.text_editor import rate_limit
+from models.text_editor.rate_limit import RateLimiter
+
+
+@pytest.fixture
+def waits(monkeypatch):
+    """Fake clock: sleeping advances monotonic time instantly, and each wait is recorded."""
+    clock = [0.0]
+    recorded = []
+
+    async def sleep(seconds):
+        recorded.append(seconds)
+        clock[0] += seconds
+
+    monkeypatch.setattr(rate_limit.time, 'monotonic', lambda: clock[0])
+    monkeypatch.setattr(rate_limit.asyncio, 'sleep', sleep)
+    return recorded
+
+
+def _acquire_all(limiter: RateLimiter, *tokens: int) -> None:
+    async def run():
+        for count in tokens:
+            await limiter.acquire(count)
+
+    asyncio.run(run())
+
+
+def test_full_buckets_do_not_wait(waits):
+    _acquire_all(RateLimiter(requests_per_minute=3, tokens_per_minute=1000), 100, 100, 100)
+
+    assert waits == []
+
+
+def test_waits_for_one_request_to_refill(waits):
+    _acquire_all(RateLimiter(requests_per_minute=2, tokens_per_minute=1000), 10, 10, 10)
+
+    # Two requests per minute refill one request every 30 seconds.
+    assert waits == [pytest.approx(30.0)]
+
+
+def test_waits_for_missing_tokens_only(waits):
+    _acquire_all(RateLimiter(requests_per_minute=100, tokens_per_minute=600), 600, 300)
+
+    # 600 tokens per minute refill 10 per second, and 300 are missing.
+    assert waits == [pytest.approx(30.0)]
+
+
+def test_call_larger_than_the_budget_drains_a_full_bucket(waits):
+    _acquire_all(RateLimiter(requests_per_minute=60, tokens_per_minute=100), 1000, 1000)
+
+    assert waits == [pytest.approx(60.0)]
@@ -0,0 +1,51 @@
+import pytest
+
+from models.text_editor.response_cache import ResponseCache, cacheable
+
+
+def test_key_does_not_depend_on_key_order():
+    assert ResponseCache.key({'model': 'm', 'max_tokens': 10}) == ResponseCache.key({'max_tokens': 10, 'model': 'm'})
+    assert ResponseCache.key({'model': 'm', 'max_tokens': 10}) != ResponseCache.key({'model': 'm', 'max_tokens': 11})
+
+
+def test_evicts_least_recently_used():
+    cache = ResponseCache(max_size=2)
+    cache.put('a', 'A')
+    cache.put('b', 'B')
+    assert cache.get('a') == 'A'
+    cache.put('c', 'C')
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 'A'
+    assert cache.get('c') == 'C'
+
+
+def test_counts_hits_and_misses():
+    cache = ResponseCache(max_size=2)
+    cache.put('a', 'A')
+    cache.get('a')
+    cache.get('b')
+
+    assert cache.get_stats() == {'size': 1, 'max_size': 2, 'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+
+
+def test_zero_size_disables_the_cache():
+    cache = ResponseCache(max_size=0)
+    cache.put('a', 'A')
+
+    assert cache.get('a') is None
+
+
+@pytest.mark.parametrize(
+    ('content', 'expect_json', 'expected'),
+    [
+        ('Готово.', False, True),
+        ('', False, False),
+        ('{"weak_spots": []}', True, True),
+        ('```json\n{"weak_spots": []}\n```', True, True),
+        ('{"weak_spots": [{"original_text": "обрыв', True, False),
+        ('Не могу ответить', True, False),
+    ],
+)
+def test_cacheable(content, expect_json, expected):
+    assert cacheable(content, expect_json) is expected
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from models.text_editor import semantic_cache
+from models.text_editor.semantic_cache import SemanticCache
+
+
+def _unit(*values: float) -> np.ndarray:
+    vec = np.array(values, dtype=np.float32)
+    return vec / np.linalg.norm(vec)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(semantic_cache.time, 'time', lambda: now[0])
+    return now
+
+
+def test_hits_only_above_the_threshold(clock):
+    cache = SemanticCache(dim=3, capacity=4, threshold=0.95)
+    cache.put(_unit(1, 0, 0), 'first')
+
+    assert cache.get(_unit(1, 0.1, 0)) == 'first'
+    assert cache.get(_unit(1, 1, 0)) is None
+
+
+def test_returns_the_closest_entry(clock):
+    cache = SemanticCache(dim=3, capacity=4, threshold=0.9)
+    cache.put(_unit(1, 0, 0), 'x')
+    cache.put(_unit(0, 1, 0), 'y')
+
+    assert cache.get(_unit(0.1, 1, 0)) == 'y'
+
+
+def test_expired_entries_miss_and_are_dropped_on_put(clock):
+    cache = SemanticCache(dim=3, capacity=4, ttl=60)
+    cache.put(_unit(1, 0, 0), 'old')
+    clock[0] += 61
+
+    assert cache.get(_unit(1, 0, 0)) is None
+    cache.put(_unit(0, 1, 0), 'new')
+    assert len(cache) == 1
+    assert cache.get(_unit(0, 1, 0)) == 'new'
+
+
+def test_full_cache_evicts_the_oldest_half(clock):
+    cache = SemanticCache(dim=3, capacity=4)
+    for i, vec in enumerate([(1, 0, 0), (0, 1, 0), (0, 0, 1), (1, 1, 0)]):
+        cache.put(_unit(*vec), str(i))
+    cache.put(_unit(1, 0, 1), '4')
+
+    assert len(cache) == 3
+    assert cache.get(_unit(1, 0, 0)) is None
+    assert cache.get(_unit(0, 0, 1)) == '2'
+    assert cache.get(_unit(1, 0, 1)) == '4'
+
+
+def test_save_and_load_keep_entries_and_ttl(clock, tmp_path):
+    cache = SemanticCache(dim=3, capacity=4, threshold=0.9, ttl=60)
+    cache.put(_unit(1, 0, 0), 'saved')
+    path = str(tmp_path / 'cache')
+    cache.save(path)
+
+    loaded = SemanticCache.load(path, capacity=8)
+    assert (loaded.threshold, loaded.ttl, loaded.capacity) == (0.9, 60, 8)
+    assert loaded.get(_unit(1, 0, 0)) == 'saved'
+    clock[0] += 61
+    assert loaded.get(_unit(1, 0, 0)) is None
@@ -0,0 +1,131 @@
+import asyncio
+
+import orjson
+import pytest
+
+from models.text_editor.service import TextAnalysisService, _weak_spots_budget
+from models.text_editor.types import AnalysisType, WeakSpot
+
+TEXT = 'Мы, короче, запустили продукт и получили первых клиентов.'
+
+
+class _BrokenReplies:
+    async def analyze_json(self, *args, **kwargs):
+        raise ValueError('No JSON object in the model reply')
+
+
+class _RecordingReplies:
+    def __init__(self):
+        self.calls = []
+
+    async def analyze_json(self, prompt, text, **kwargs):
+        self.calls.append(prompt)
+        return {'processed_text': 'Переписанный текст.', 'changes_summary': [], 'processing_details': {}}
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setenv('OPENROUTER_API_KEY', 'test')
+    service = TextAnalysisService()
+    service.openai_service = _BrokenReplies()
+    return service
+
+
+def test_unparsed_reply_is_not_praised(service, monkeypatch):
+    async def analyze_weak_spots(text, language):
+        return [], ['Не удалось обработать анализ слабых мест']
+
+    monkeypatch.setattr(service, 'analyze_weak_spots', analyze_weak_spots)
+    weak_spots, _, feedback = asyncio.run(service._analyze_with_feedback(TEXT, 'ru'))
+
+    assert weak_spots == []
+    assert feedback == service._unavailable_feedback()
+
+
+def test_unparsed_reply_falls_back_to_separate_calls(service, monkeypatch):
+    spot = WeakSpot(position=4, original_text='короче', issue_type='filler', suggestion='', severity='low')
+    feedback = {'feedback': 'Уберите слова-паразиты.', 'strengths': [], 'areas_for_improvement': []}
+
+    async def analyze_weak_spots(text, language):
+        return [spot], []
+
+    async def generate_feedback(text, weak_spots, recommendations, language):
+        assert weak_spots == [spot]
+        return feedback
+
+    monkeypatch.setattr(service, 'analyze_weak_spots', analyze_weak_spots)
+    monkeypatch.setattr(service, 'generate_feedback', generate_feedback)
+
+    assert asyncio.run(service._analyze_with_feedback(TEXT, 'ru')) == ([spot], [], feedback)
+
+
+def test_missing_feedback_is_generated_from_the_summary(service, monkeypatch):
+    class _NoFeedback:
+        async def analyze_json(self, *args, **kwargs):
+            return {'weak_spots': [], 'global_recommendations': ['Добавьте вывод']}
+
+    feedback = {'feedback': 'Текст понятный.', 'strengths': [], 'areas_for_improvement': []}
+
+    async def generate_feedback(text, weak_spots, recommendations, language):
+        assert recommendations == ['Добавьте вывод']
+        return feedback
+
+    service.openai_service = _NoFeedback()
+    monkeypatch.setattr(service, 'generate_feedback', generate_feedback)
+
+    assert asyncio.run(service._analyze_with_feedback(TEXT, 'ru')) == ([], ['Добавьте вывод'], feedback)
+
+
+def test_speech_time_alone_makes_no_edit_call(service):
+    service.openai_service = _RecordingReplies()
+    result = asyncio.run(service.process_text_combined(TEXT, [AnalysisType.SPEECH_TIME], None, 'ru'))
+
+    assert service.openai_service.calls == []
+    assert result['processed_text'] == TEXT
+    assert result['word_count_original'] == result['word_count_final'] == 8
+
+
+def test_weak_spots_with_speech_time_makes_no_edit_call(service, monkeypatch):
+    async def analyze_weak_spots(text, language):
+        return [], []
+
+    service.openai_service = _RecordingReplies()
+    monkeypatch.setattr(service, 'analyze_weak_spots', analyze_weak_spots)
+    _, _, result = asyncio.run(service.analyze_and_process(TEXT, [AnalysisType.SPEECH_TIME], None, 'ru'))
+
+    assert service.openai_service.calls == []
+    assert result['processed_text'] == TEXT
+
+
+def test_truncated_stream_is_requested_again(service):
+    pytest.importorskip('ijson')
+    spot = {'position': 4, 'original_text': 'короче', 'issue_type': 'filler', 'suggestion': '', 'severity': 'low'}
+
+    class _TruncatedStream:
+        def __init__(self):
+            self.budgets = []
+
+        async def stream_text(self, *args, on_finish=None, **kwargs):
+            yield '{"weak_spots": [{"position": 4, "original_text": "коро'
+            on_finish('length')
+
+        async def analyze_text(self, *args, max_tokens=None, **kwargs):
+            self.budgets.append(max_tokens)
+            return orjson.dumps({'weak_spots': [spot], 'global_recommendations': []}).decode()
+
+    service.openai_service = _TruncatedStream()
+    _, weak_spots, recommendations = asyncio.run(service._stream_weak_spots(TEXT, 'ru'))
+
+    assert [s.original_text for s in weak_spots] == ['короче']
+    assert recommendations == []
+    assert service.openai_service.budgets[0] > _weak_spots_budget(TEXT)
+
+
+def test_merged_filler_counts_accept_strings(service):
+    parts = [
+        {'processed_text': 'Первый абзац.', 'processing_details': {'parasites_removed': '3'}},
+        {'processed_text': 'Второй абзац.', 'processing_details': {'parasites_removed': 2}},
+        {'processed_text': 'Третий абзац.', 'processing_details': {'parasites_removed': None}},
+    ]
+
+    assert service._merge_chunks(parts)['processing_details']['parasites_removed'] == 5
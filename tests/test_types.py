@@ -0,0 +1,19 @@
+import pytest
+
+from models.text_editor.types import ProcessingStep
+
+
+@pytest.mark.parametrize(
+    ('changes', 'metadata', 'expected_changes', 'expected_metadata'),
+    [
+        (['Удалены слова-паразиты'], {'parasites_removed': 2}, ['Удалены слова-паразиты'], {'parasites_removed': 2}),
+        ('Упрощён канцелярит', None, ['Упрощён канцелярит'], {}),
+        (None, ['not', 'a', 'dict'], [], {}),
+        ([1, None, 'Добавлена структура'], 'details', ['1', 'Добавлена структура'], {}),
+    ],
+)
+def test_processing_step_coerces_model_output(changes, metadata, expected_changes, expected_metadata):
+    step = ProcessingStep(step_name='step', output_text='text', changes_made=changes, metadata=metadata)
+
+    assert step.changes_made == expected_changes
+    assert step.metadata == expected_metadata
@@ -0,0 +1,32 @@
+from langgraph.checkpoint.base import empty_checkpoint
+
+from models.text_editor.workflow import BoundedMemorySaver
+
+
+def _put(saver: BoundedMemorySaver, thread_id: str) -> None:
+    config = {'configurable': {'thread_id': thread_id, 'checkpoint_ns': ''}}
+    checkpoint = empty_checkpoint()
+    checkpoint['channel_values'] = {'current_text': f'text of {thread_id}'}
+    checkpoint['channel_versions'] = {'current_text': 1}
+    next_config = saver.put(config, checkpoint, {}, {'current_text': 1})
+    saver.put_writes(next_config, [('current_text', 'edited')], 'task')
+
+
+def test_evicts_every_store_of_the_oldest_thread():
+    saver = BoundedMemorySaver(max_threads=2)
+    for thread_id in ('a', 'b', 'c'):
+        _put(saver, thread_id)
+
+    assert set(saver.storage) == {'b', 'c'}
+    assert {key[0] for key in saver.writes} == {'b', 'c'}
+    assert {key[0] for key in saver.blobs} == {'b', 'c'}
+
+
+def test_reading_a_thread_keeps_it():
+    saver = BoundedMemorySaver(max_threads=2)
+    _put(saver, 'a')
+    _put(saver, 'b')
+    saver.get_tuple({'configurable': {'thread_id': 'a', 'checkpoint_ns': ''}})
+    _put(saver, 'c')
+
+    assert set(saver.storage) == {'a', 'c'}